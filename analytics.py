@@ -0,0 +1,115 @@
+"""
+Spending aggregates shared by the REST API and the chat tools.
+
+Everything here is a single grouped query computed in the database; callers
+never loop over categories or expenses in Python. Totals come from the
+daily_spend rollup (see rollup.py), so a year-long period reads at most a few
+hundred rows per category instead of every expense.
+"""
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import and_, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import models
+
+
+async def category_spend(
+    db: AsyncSession,
+    user_id: int,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """
+    Every category of the user with the sum of its expenses in
+    [date_from, date_to] (either end open if None) — categories with no
+    spending get 0. One LEFT JOIN + GROUP BY, whatever the category count.
+    """
+    ds = models.DailySpend
+    on = [ds.category_id == models.Category.id, ds.user_id == user_id]
+    if date_from:
+        on.append(ds.day >= date_from)
+    if date_to:
+        on.append(ds.day <= date_to)
+
+    stmt = (
+        select(
+            models.Category.id,
+            models.Category.name,
+            models.Category.icon,
+            models.Category.color,
+            models.Category.budget,
+            func.coalesce(func.sum(ds.total), 0).label("spent"),
+        )
+        .outerjoin(ds, and_(*on))
+        .where(models.Category.user_id == user_id)
+        .group_by(models.Category.id)
+        .order_by(models.Category.created_at)
+    )
+    return (await db.execute(stmt)).all()
+
+
+async def spending_totals(db: AsyncSession, user_id: int, date_from: date, date_to: date):
+    """(total amount, number of expenses) in [date_from, date_to]."""
+    ds = models.DailySpend
+    row = (await db.execute(
+        select(func.coalesce(func.sum(ds.total), 0), func.coalesce(func.sum(ds.count), 0))
+        .where(ds.user_id == user_id, ds.day >= date_from, ds.day <= date_to)
+    )).one()
+    return row[0], row[1]
+
+
+async def top_categories(db: AsyncSession, user_id: int, date_from: date, date_to: date, limit: int):
+    """Categories with the highest spending in the period, as (name, total) rows."""
+    ds = models.DailySpend
+    total = func.sum(ds.total).label("total")
+    return (await db.execute(
+        select(models.Category.name, total)
+        .join(ds, and_(ds.category_id == models.Category.id, ds.user_id == user_id))
+        .where(models.Category.user_id == user_id, ds.day >= date_from, ds.day <= date_to)
+        .group_by(models.Category.id)
+        .order_by(total.desc())
+        .limit(limit)
+    )).all()
+
+
+def _period_label(db: AsyncSession, period: str, day_col):
+    """SQL expression turning a DATE into 'YYYY-MM' (month) or 'YYYY' (year)."""
+    if db.bind.dialect.name == "postgresql":
+        return func.to_char(day_col, "YYYY-MM" if period == "month" else "YYYY")
+    return func.strftime("%Y-%m" if period == "month" else "%Y", day_col)
+
+
+async def period_totals(
+    db: AsyncSession,
+    user_id: int,
+    period: str,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """(period, total, count) rows per month or year, oldest first."""
+    ds = models.DailySpend
+    label = _period_label(db, period, ds.day).label("period")
+    stmt = (
+        select(label, func.sum(ds.total).label("total"), func.sum(ds.count).label("count"))
+        .where(ds.user_id == user_id)
+        .group_by(label)
+        .order_by(label)
+    )
+    if date_from:
+        stmt = stmt.where(ds.day >= date_from)
+    if date_to:
+        stmt = stmt.where(ds.day <= date_to)
+    return (await db.execute(stmt)).all()
+
+
+async def daily_series(db: AsyncSession, user_id: int, date_from: date, date_to: date):
+    """(day, total, count) for every day with spending in the period."""
+    ds = models.DailySpend
+    return (await db.execute(
+        select(ds.day, func.sum(ds.total).label("total"), func.sum(ds.count).label("count"))
+        .where(ds.user_id == user_id, ds.day >= date_from, ds.day <= date_to)
+        .group_by(ds.day)
+        .order_by(ds.day)
+    )).all()
@@ -1,26 +1,131 @@
 import os
+import json
+import time
+import asyncio
+import threading
 import bcrypt
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
+from typing import Optional
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from database import get_async_db
 import models
 
 SECRET_KEY = os.getenv("SECRET_KEY", "change-this-secret-in-production-use-long-random-string")
 ALGORITHM  = "HS256"
 TOKEN_EXPIRE_DAYS = 30
 
+BCRYPT_ROUNDS        = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_WORKERS     = int(os.getenv("PASSWORD_WORKERS", "2"))
+PASSWORD_QUEUE_LIMIT = int(os.getenv("PASSWORD_QUEUE_LIMIT", "32"))
+
+USER_CACHE_TTL  = int(os.getenv("USER_CACHE_TTL", "60"))        # seconds
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_URL  = os.getenv("USER_CACHE_URL")                   # redis://… to share between workers
+
 http_bearer = HTTPBearer()
 
 
+# ─────────────────────────── PASSWORDS ───────────────────────────
+#
+# bcrypt is deliberately slow. It runs on a small dedicated executor instead of
+# the request threadpool, and admission is capped at workers + queue limit:
+# past that, callers get a 503 right away instead of piling up and starving
+# every other endpoint.
+
+class PasswordPool:
+    def __init__(self, workers: int = PASSWORD_WORKERS, queue_limit: int = PASSWORD_QUEUE_LIMIT):
+        self.workers     = workers
+        self.queue_limit = queue_limit
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._slots    = threading.BoundedSemaphore(workers + queue_limit)
+        self._lock     = threading.Lock()
+        self.in_flight = 0
+        self.running   = 0
+        self.completed = 0
+        self.rejected  = 0
+        self.wait_seconds = 0.0   # total time jobs spent queued
+
+    def submit(self, fn, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many sign-in attempts in progress, try again shortly",
+                headers={"Retry-After": "1"},
+            )
+        queued_at = time.perf_counter()
+
+        def job():
+            with self._lock:
+                self.running += 1
+                self.wait_seconds += time.perf_counter() - queued_at
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self.running   -= 1
+                    self.in_flight -= 1
+                    self.completed += 1
+                self._slots.release()
+
+        with self._lock:
+            self.in_flight += 1
+        return self._executor.submit(job)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers":     self.workers,
+                "queue_limit": self.queue_limit,
+                "running":     self.running,
+                "queue_depth": self.in_flight - self.running,
+                "completed":   self.completed,
+                "rejected":    self.rejected,
+                "avg_wait_ms": round(self.wait_seconds / self.completed * 1000, 2) if self.completed else None,
+            }
+
+
+password_pool = PasswordPool()
+
+
+def _hash(password: str) -> str:
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS)).decode()
+
+
+def _check(plain: str, hashed: str) -> bool:
+    return bcrypt.checkpw(plain.encode(), hashed.encode())
+
+
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return password_pool.submit(_hash, password).result()
 
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return bcrypt.checkpw(plain.encode(), hashed.encode())
+    return password_pool.submit(_check, plain, hashed).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(password_pool.submit(_hash, password))
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    return await asyncio.wrap_future(password_pool.submit(_check, plain, hashed))
+
+
+def needs_rehash(hashed: str) -> bool:
+    """True if the hash was made with a different BCRYPT_ROUNDS than today's."""
+    try:
+        return int(hashed.split("$")[2]) != BCRYPT_ROUNDS
+    except (IndexError, ValueError):
+        return True
 
 
 def create_access_token(user_id: int) -> str:
@@ -28,9 +133,117 @@ def create_access_token(user_id: int) -> str:
     return jwt.encode({"sub": str(user_id), "exp": expire}, SECRET_KEY, algorithm=ALGORITHM)
 
 
-def get_current_user(
+# ─────────────────────────── USER CACHE ───────────────────────────
+#
+# get_current_user runs on every API call. Caching the user's columns lets it
+# skip the users query; entries expire after USER_CACHE_TTL and are dropped as
+# soon as a User row is updated or deleted through the ORM.
+#
+# The User it returns is detached and only has CACHED_USER_FIELDS loaded, on a
+# cache hit or miss alike: an AsyncSession can't lazy-load, so touching
+# anything else (password_hash, relationships) raises DetachedInstanceError
+# instead of working only when the cache happened to miss. Load the row
+# explicitly if a route needs more.
+#
+# get/set are awaitable so the Redis backend never blocks the event loop;
+# invalidate stays synchronous because it runs from ORM flush events.
+
+CACHED_USER_FIELDS = ("id", "email", "username", "created_at")
+
+
+class UserCache:
+    """In-process TTL + LRU cache of user fields keyed by user id."""
+
+    def __init__(self, ttl: int = USER_CACHE_TTL, maxsize: int = USER_CACHE_SIZE):
+        self.ttl     = ttl
+        self.maxsize = maxsize
+        self.hits    = 0
+        self.misses  = 0
+        self._data: OrderedDict[int, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def get(self, user_id: int) -> Optional[dict]:
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry and entry[0] > time.monotonic():
+                self._data.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self._data.pop(user_id, None)
+            self.misses += 1
+            return None
+
+    async def set(self, user_id: int, fields: dict) -> None:
+        with self._lock:
+            self._data[user_id] = (time.monotonic() + self.ttl, fields)
+            self._data.move_to_end(user_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend":  "memory",
+            "size":     len(self._data),
+            "hits":     self.hits,
+            "misses":   self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+        }
+
+
+class RedisUserCache(UserCache):
+    """Same interface, backed by Redis so every worker sees invalidations."""
+
+    def __init__(self, url: str, ttl: int = USER_CACHE_TTL):
+        super().__init__(ttl=ttl)
+        try:
+            import redis
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("USER_CACHE_URL is set but the `redis` package is not installed")
+        self._redis = redis.asyncio.Redis.from_url(url)
+        self._sync  = redis.Redis.from_url(url)   # for invalidate(), called from flush events
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"fintrack:user:{user_id}"
+
+    async def get(self, user_id: int) -> Optional[dict]:
+        raw = await self._redis.get(self._key(user_id))
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        fields = json.loads(raw)
+        fields["created_at"] = datetime.fromisoformat(fields["created_at"])
+        return fields
+
+    async def set(self, user_id: int, fields: dict) -> None:
+        await self._redis.set(self._key(user_id), json.dumps(fields, default=str), ex=self.ttl)
+
+    def invalidate(self, user_id: int) -> None:
+        self._sync.delete(self._key(user_id))
+
+    def stats(self) -> dict:
+        return {**super().stats(), "backend": "redis", "size": None}
+
+
+user_cache = RedisUserCache(USER_CACHE_URL) if USER_CACHE_URL else UserCache()
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target: models.User) -> None:
+    user_cache.invalidate(target.id)
+
+
+async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(http_bearer),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> models.User:
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
@@ -38,7 +251,14 @@ def get_current_user(
     except (JWTError, KeyError, ValueError):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
 
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    fields = await user_cache.get(user_id)
+    if fields is None:
+        user = await db.get(models.User, user_id)
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        fields = {f: getattr(user, f) for f in CACHED_USER_FIELDS}
+        await user_cache.set(user_id, fields)
+
+    user = models.User(**fields)
+    make_transient_to_detached(user)
     return user
@@ -0,0 +1,135 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Lets /api/chat run end to end without a key or network access:
+
+    python bench/openai_stub.py --port 8765 --latency-ms 300
+    OPENAI_API_KEY=stub OPENAI_BASE_URL=http://127.0.0.1:8765/v1 uvicorn main:app
+
+The first round of every conversation answers with tool calls (--tools); once
+tool results are in the history it answers with a plain text reply. Each call
+sleeps --latency-ms to mimic model think time; with "stream": true the reply
+is sent as SSE chunks, one word every --token-ms.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+TOOL_ARGS = {
+    "add_expense":          {"amount": 12.5, "description": "Coffee", "category_name": "Food"},
+    "get_spending_summary": {"period": "month"},
+    "list_expenses":        {"limit": 10, "period": "month"},
+    "list_categories":      {},
+    "get_top_categories":   {"period": "month", "limit": 3},
+}
+
+config = {
+    "latency_ms": 300,
+    "token_ms":   20,
+    "tools":      ["get_spending_summary"],
+    "reply":      "Here is your summary (stub).",
+}
+
+app = FastAPI(title="OpenAI stub")
+
+
+def _wants_tools(body: dict) -> bool:
+    """Tool round unless the model already saw tool results for the last user turn."""
+    if not body.get("tools") or not config["tools"]:
+        return False
+    for msg in reversed(body["messages"]):
+        if msg.get("role") == "tool":
+            return False
+        if msg.get("role") == "user":
+            return True
+    return True
+
+
+def _tool_calls() -> list[dict]:
+    return [
+        {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(TOOL_ARGS.get(name, {}))},
+        }
+        for name in config["tools"]
+    ]
+
+
+def _chunk(completion_id: str, model: str, delta: dict, finish=None) -> str:
+    payload = {
+        "id": completion_id,
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+    }
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+async def _stream(completion_id: str, model: str, message: dict, finish: str):
+    yield _chunk(completion_id, model, {"role": "assistant", "content": ""})
+    if message.get("tool_calls"):
+        calls = [{"index": i, **tc} for i, tc in enumerate(message["tool_calls"])]
+        yield _chunk(completion_id, model, {"tool_calls": calls})
+    else:
+        words = message["content"].split(" ")
+        for i, word in enumerate(words):
+            await asyncio.sleep(config["token_ms"] / 1000)
+            yield _chunk(completion_id, model, {"content": word if i == 0 else " " + word})
+    yield _chunk(completion_id, model, {}, finish)
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    await asyncio.sleep(config["latency_ms"] / 1000)
+
+    if _wants_tools(body):
+        message, finish = {"role": "assistant", "content": None, "tool_calls": _tool_calls()}, "tool_calls"
+    else:
+        message, finish = {"role": "assistant", "content": config["reply"]}, "stop"
+
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+    if body.get("stream"):
+        return StreamingResponse(
+            _stream(completion_id, body.get("model", "stub"), message, finish),
+            media_type="text/event-stream",
+        )
+
+    return {
+        "id": completion_id,
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{"index": 0, "message": message, "finish_reason": finish}],
+        "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+    }
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=int, default=config["latency_ms"])
+    parser.add_argument("--token-ms", type=int, default=config["token_ms"])
+    parser.add_argument("--tools", default=",".join(config["tools"]),
+                        help="comma-separated tool names for the first round ('' for none)")
+    args = parser.parse_args()
+
+    config["latency_ms"] = args.latency_ms
+    config["token_ms"]   = args.token_ms
+    config["tools"] = [t for t in args.tools.split(",") if t]
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
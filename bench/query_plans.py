@@ -0,0 +1,233 @@
+"""
+Query-plan and query-count guard for the hot endpoints.
+
+Seeds a throwaway SQLite database (or uses --database-url), calls each hot
+endpoint and chat tool once to warm caches and once more while recording
+every statement it runs, then EXPLAINs each SELECT/UPDATE/DELETE. The result
+is compared with the stored baseline:
+
+    python bench/query_plans.py            # check, exit 1 on regressions
+    python bench/query_plans.py --update   # accept the current plans/counts
+
+A check fails when an endpoint runs more queries than its baseline (an N+1
+creeping in), when a plan differs from the baseline, or when any plan
+full-scans expenses, daily_spend or categories. Baselines live next to this file, one
+per dialect (query_plans.sqlite.json, query_plans.postgresql.json), and
+only hold for the seeded scale — regenerate them when that changes.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Full scans of these tables are always a regression, baseline or not
+NO_FULL_SCAN = ("expenses", "daily_spend", "categories")
+
+ENDPOINTS = [
+    ("expenses.list",           "GET", "/api/expenses", {"limit": 100}),
+    ("expenses.list_category",  "GET", "/api/expenses", {"limit": 100, "category_id": "{category_id}"}),
+    ("expenses.list_range",     "GET", "/api/expenses", {"limit": 100, "date_from": "2024-01-01", "date_to": "2024-03-31"}),
+    ("expenses.list_cursor",    "GET", "/api/expenses", {"limit": 100, "cursor": "{cursor}"}),
+    ("expenses.search",         "GET", "/api/expenses", {"limit": 100, "search": "coffee"}),
+    ("expenses.search_ranked",  "GET", "/api/expenses", {"limit": 100, "search": "coffee", "order": "relevance"}),
+    ("categories.list",         "GET", "/api/categories", {}),
+    ("categories.spend",        "GET", "/api/categories/spend", {}),
+    ("settings.get",            "GET", "/api/settings", {}),
+    ("stats.summary",           "GET", "/api/stats/summary", {}),
+    ("stats.totals",            "GET", "/api/stats/totals", {"period": "month"}),
+    ("stats.daily",             "GET", "/api/stats/daily", {}),
+    ("stats.budgets",           "GET", "/api/stats/budgets", {}),
+    ("sync.full",               "GET", "/api/sync", {"limit": 500}),
+    ("export.json",             "GET", "/api/export", {}),
+    ("export.ndjson",           "GET", "/api/export", {"format": "ndjson"}),
+]
+
+TOOLS = [
+    ("chat.list_categories",      "list_categories",      {}),
+    ("chat.get_spending_summary", "get_spending_summary", {"period": "month"}),
+    ("chat.list_expenses",        "list_expenses",        {"limit": 10, "period": "month"}),
+    ("chat.list_expenses_cat",    "list_expenses",        {"limit": 10, "category_name": "Food"}),
+    ("chat.get_top_categories",   "get_top_categories",   {"period": "year", "limit": 3}),
+]
+
+
+def _normalize_sql(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql).strip()[:160]
+
+
+def _normalize_plan(lines: list[str]) -> list[str]:
+    # Drop row estimates and volatile numbers so only the access path is compared
+    return [re.sub(r"\s*\(~\d+ rows?\)", "", line).strip() for line in lines]
+
+
+class Recorder:
+    def __init__(self, engines):
+        self.active = False
+        self.statements: list[tuple] = []
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and not executemany:
+            self.statements.append((conn.engine, statement, parameters))
+
+    def run(self, call) -> list[tuple]:
+        call()                       # warm-up: user cache, lazy clients
+        self.statements = []
+        self.active = True
+        try:
+            call()
+        finally:
+            self.active = False
+        return self.statements
+
+
+def explain(client, eng, statement: str, parameters) -> list[str]:
+    dialect = eng.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN (COSTS OFF) "
+    if eng is database.engine:
+        with eng.connect() as conn:
+            rows = conn.exec_driver_sql(prefix + statement, parameters).all()
+    else:
+        async def run():
+            async with database.async_engine.connect() as conn:
+                return (await conn.exec_driver_sql(prefix + statement, parameters)).all()
+        rows = client.portal.call(run)
+    # SQLite rows are (id, parent, notused, detail); Postgres rows are one text column
+    return _normalize_plan([row[-1] for row in rows])
+
+
+def full_scans(plan: list[str]) -> list[str]:
+    return [
+        line for line in plan
+        if re.match(rf"^SCAN ({'|'.join(NO_FULL_SCAN)})\b", line) and "INDEX" not in line
+        or re.match(rf"^Seq Scan on ({'|'.join(NO_FULL_SCAN)})\b", line.lstrip("-> "))
+    ]
+
+
+def capture(client, recorder: Recorder, ctx: dict) -> dict:
+    results = {}
+
+    def endpoint(method, path, params):
+        params = {k: str(v).format(**ctx) for k, v in params.items()}
+        def call():
+            r = client.request(method, path, params=params, headers=ctx["headers"])
+            assert r.status_code < 400, f"{path} → {r.status_code}: {r.text[:200]}"
+        return call
+
+    def tool(name, args):
+        async def run():
+            async with database.AsyncSessionLocal() as db:
+                return await chat.execute_tool(name, args, ctx["user_id"], db)
+        return lambda: client.portal.call(run)
+
+    calls = [(n, endpoint(m, p, q)) for n, m, p, q in ENDPOINTS] + [(n, tool(t, a)) for n, t, a in TOOLS]
+    for name, call in calls:
+        statements = recorder.run(call)
+        queries = []
+        for eng, statement, parameters in statements:
+            entry = {"sql": _normalize_sql(statement)}
+            if re.match(r"\s*(SELECT|UPDATE|DELETE|WITH)\b", statement, re.I):
+                entry["plan"] = explain(client, eng, statement, parameters)
+            queries.append(entry)
+        results[name] = {"queries": len(statements), "statements": queries}
+    return results
+
+
+def compare(baseline: dict, current: dict) -> list[str]:
+    problems = []
+    for name, cur in current.items():
+        for q in cur["statements"]:
+            for line in full_scans(q.get("plan", [])):
+                problems.append(f"{name}: full scan — {line}\n    {q['sql']}")
+
+        base = baseline.get(name)
+        if base is None:
+            problems.append(f"{name}: no baseline (run with --update)")
+            continue
+        if cur["queries"] > base["queries"]:
+            problems.append(f"{name}: {cur['queries']} queries, baseline {base['queries']}")
+        elif cur["queries"] < base["queries"]:
+            print(f"note: {name} runs {cur['queries']} queries, baseline {base['queries']} — consider --update")
+
+        base_plans = [q.get("plan") for q in base["statements"]]
+        cur_plans = [q.get("plan") for q in cur["statements"]]
+        if cur["queries"] == base["queries"] and base_plans != cur_plans:
+            for b, c in zip(base["statements"], cur["statements"]):
+                if b.get("plan") != c.get("plan"):
+                    problems.append(
+                        f"{name}: plan changed\n    {c['sql']}\n"
+                        f"    baseline: {b.get('plan')}\n    current:  {c.get('plan')}"
+                    )
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="write the current plans as the baseline")
+    parser.add_argument("--database-url", help="use this (already seeded) database instead of a temp SQLite file")
+    parser.add_argument("--expenses", type=int, default=5000, help="rows to seed into the temp database")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}/query_plans.db"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+
+    sys.path.insert(0, str(ROOT))
+    global database, chat, event
+    from sqlalchemy import event, select
+    from fastapi.testclient import TestClient
+    import database, models
+    from routers import chat
+    import seed
+
+    if tmp:
+        seed.seed(users=1, categories=12, expenses=args.expenses, days=730, batch=5000, seed=42, append=False)
+
+    import main as app_main
+    recorder = Recorder([database.engine, database.async_engine.sync_engine])
+
+    with TestClient(app_main.app) as client:
+        r = client.post("/api/auth/login", json={"email": seed.email(1), "password": seed.PASSWORD})
+        if r.status_code != 200:
+            sys.exit(f"Login as {seed.email(1)} failed — seed the database with bench/seed.py first")
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+        with database.engine.connect() as conn:
+            user_id = conn.scalar(select(models.User.id).where(models.User.email == seed.email(1)))
+            category_id = conn.scalar(select(models.Category.id).where(models.Category.user_id == user_id).limit(1))
+        page = client.get("/api/expenses", params={"limit": 1, "offset": 1000}, headers=headers)
+        ctx = {
+            "headers": headers, "user_id": user_id, "category_id": category_id,
+            "cursor": page.headers.get("x-next-cursor", ""),
+        }
+        current = capture(client, recorder, ctx)
+
+    path = Path(__file__).with_name(f"query_plans.{database.engine.dialect.name}.json")
+    if args.update:
+        path.write_text(json.dumps(current, indent=2, ensure_ascii=False) + "\n")
+        print(f"Wrote {path.name}: {len(current)} endpoints")
+        return
+
+    if not path.exists():
+        sys.exit(f"No baseline {path.name} — run with --update first")
+    problems = compare(json.loads(path.read_text()), current)
+    for name, cur in current.items():
+        print(f"{name:<28}{cur['queries']:>3} queries")
+    if problems:
+        print(f"\n{len(problems)} regression(s):")
+        print("\n".join(f"  {p}" for p in problems))
+        sys.exit(1)
+    print("\nAll plans and query counts match the baseline")
+
+
+if __name__ == "__main__":
+    main()
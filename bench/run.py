@@ -0,0 +1,317 @@
+"""
+Latency / throughput benchmark for the FinTrack API.
+
+Seed first (bench/seed.py), then either drive the app in-process through
+httpx's ASGI transport — no network, measures the app itself:
+
+    DATABASE_URL=sqlite:///./bench.db python bench/run.py
+
+or over HTTP against a uvicorn started for the run (--spawn) or already
+running (--url):
+
+    DATABASE_URL=sqlite:///./bench.db python bench/run.py --spawn
+    python bench/run.py --url http://127.0.0.1:8000
+
+Every scenario sends --requests requests from --concurrency concurrent
+clients after a short warm-up, and reports p50/p95/p99/mean latency,
+throughput and the app process's peak RSS during that scenario (Linux; the
+peak is reset between scenarios through /proc/<pid>/clear_refs). --stub
+starts bench/openai_stub.py and adds the chat scenarios. --json writes the
+results for comparing runs. Needs httpx (pip install httpx).
+
+All requests come from one user, so the per-user rate limit is switched off
+for in-process and --spawn runs; start a --url server with RATE_LIMIT=0.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from seed import PASSWORD, email   # noqa: E402  (bench/ is on sys.path as the script dir)
+
+
+@dataclass
+class Scenario:
+    name:     str
+    method:   str
+    path:     str
+    params:   dict = field(default_factory=dict)
+    body:     Optional[Callable[["Context"], dict]] = None    # request kwargs built per call
+    requests: Optional[int] = None                             # cap for heavy scenarios
+    needs:    str = ""                                         # "stub" → only with --stub
+
+
+@dataclass
+class Context:
+    cursor: str = ""
+    counter: int = 0
+
+    def next(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+def _import_payload(rows: int) -> bytes:
+    # Same rows every call: the first import writes them, dedupe skips them afterwards
+    lines = [
+        json.dumps({"type": "expense", "amount": i + 0.5, "currency": "UAH",
+                    "description": f"bench import {i}", "date": "2024-01-01", "category": "Food"})
+        for i in range(rows)
+    ]
+    return "\n".join(lines).encode()
+
+
+IMPORT_PAYLOAD = _import_payload(1000)
+
+SCENARIOS = [
+    Scenario("expenses.list",          "GET",  "/api/expenses", {"limit": 100}),
+    Scenario("expenses.list_1000",     "GET",  "/api/expenses", {"limit": 1000}),
+    Scenario("expenses.deep_offset",   "GET",  "/api/expenses", {"limit": 100, "offset": 5000}),
+    Scenario("expenses.deep_cursor",   "GET",  "/api/expenses", {"limit": 100},
+             body=lambda ctx: {"params": {"limit": 100, "cursor": ctx.cursor}}),
+    Scenario("expenses.search",        "GET",  "/api/expenses", {"limit": 100, "search": "coffee"}),
+    Scenario("expenses.create",        "POST", "/api/expenses",
+             body=lambda ctx: {"json": {"amount": 1.5, "description": f"bench {ctx.next()}", "date": "2024-01-01"}}),
+    Scenario("categories.list",        "GET",  "/api/categories"),
+    Scenario("categories.spend",       "GET",  "/api/categories/spend"),
+    Scenario("stats.summary",          "GET",  "/api/stats/summary"),
+    Scenario("stats.totals_month",     "GET",  "/api/stats/totals", {"period": "month"}),
+    Scenario("stats.daily",            "GET",  "/api/stats/daily"),
+    Scenario("sync.page",              "GET",  "/api/sync", {"limit": 1000}),
+    Scenario("export.ndjson",          "GET",  "/api/export", {"format": "ndjson"}, requests=5),
+    Scenario("export.csv",             "GET",  "/api/export", {"format": "csv"}, requests=5),
+    Scenario("import.ndjson_dedupe",   "POST", "/api/import/stream", {"format": "ndjson", "dedupe": "true"},
+             body=lambda ctx: {"files": {"file": ("bench.ndjson", IMPORT_PAYLOAD)}}, requests=20),
+    Scenario("chat.summary",           "POST", "/api/chat", needs="stub",
+             body=lambda ctx: {"json": {"messages": [{"role": "user", "content": "How much this month?"}]}}),
+    Scenario("chat.stream",            "POST", "/api/chat", needs="stub",
+             body=lambda ctx: {"json": {"messages": [{"role": "user", "content": "How much this month?"}],
+                                        "stream": True}}),
+]
+
+
+# ─────────────────────────── PROCESS MEMORY ───────────────────────────
+
+def reset_peak_rss(pid: int) -> None:
+    try:
+        Path(f"/proc/{pid}/clear_refs").write_text("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+# ─────────────────────────── RUNNER ───────────────────────────
+
+def percentile(sorted_values: list[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * len(sorted_values) + 0.5) - 1))
+    return sorted_values[k]
+
+
+async def run_scenario(client: httpx.AsyncClient, sc: Scenario, ctx: Context, headers: dict,
+                       requests: int, concurrency: int, warmup: int, app_pid: Optional[int]) -> dict:
+    async def one() -> tuple[float, bool]:
+        kwargs = sc.body(ctx) if sc.body else {}
+        kwargs.setdefault("params", sc.params)
+        start = time.perf_counter()
+        try:
+            r = await client.request(sc.method, sc.path, headers=headers, **kwargs)
+            ok = r.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    for _ in range(warmup):
+        await one()
+
+    if app_pid:
+        reset_peak_rss(app_pid)
+    latencies, errors = [], 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            elapsed, ok = await one()
+            latencies.append(elapsed)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    peak = peak_rss_mb(app_pid) if app_pid else None
+    ms = lambda s: round(s * 1000, 2)
+    return {
+        "scenario": sc.name,
+        "requests": len(latencies),
+        "errors":   errors,
+        "p50_ms":   ms(percentile(latencies, 50)),
+        "p95_ms":   ms(percentile(latencies, 95)),
+        "p99_ms":   ms(percentile(latencies, 99)),
+        "mean_ms":  ms(statistics.fmean(latencies)) if latencies else 0.0,
+        "rps":      round(len(latencies) / wall, 1) if wall else 0.0,
+        "peak_rss_mb": round(peak, 1) if peak else None,
+    }
+
+
+async def login(client: httpx.AsyncClient, user: int) -> dict:
+    r = await client.post("/api/auth/login", json={"email": email(user), "password": PASSWORD})
+    if r.status_code != 200:
+        sys.exit(f"Login as {email(user)} failed ({r.status_code}) — run bench/seed.py first")
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def run(client: httpx.AsyncClient, args, app_pid: Optional[int]) -> list[dict]:
+    headers = await login(client, args.user)
+    ctx = Context()
+    # A cursor part-way through the list, for the deep_cursor scenario
+    r = await client.get("/api/expenses", params={"limit": 1, "offset": 5000}, headers=headers)
+    ctx.cursor = r.headers.get("x-next-cursor", "")
+
+    results = []
+    for sc in SCENARIOS:
+        if args.only and not any(sc.name.startswith(o) for o in args.only.split(",")):
+            continue
+        if sc.needs == "stub" and not args.stub:
+            continue
+        requests = min(args.requests, sc.requests) if sc.requests else args.requests
+        res = await run_scenario(client, sc, ctx, headers, requests, args.concurrency, args.warmup, app_pid)
+        results.append(res)
+        print_row(res)
+    return results
+
+
+def print_header() -> None:
+    print(f"{'scenario':<24}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+          f"{'mean ms':>10}{'req/s':>9}{'peak MB':>9}")
+
+
+def print_row(r: dict) -> None:
+    rss = f"{r['peak_rss_mb']:.0f}" if r["peak_rss_mb"] else "-"
+    print(f"{r['scenario']:<24}{r['requests']:>6}{r['errors']:>5}{r['p50_ms']:>10}{r['p95_ms']:>10}"
+          f"{r['p99_ms']:>10}{r['mean_ms']:>10}{r['rps']:>9}{rss:>9}", flush=True)
+
+
+# ─────────────────────────── PROCESSES ───────────────────────────
+
+def start_stub(port: int, latency_ms: int) -> subprocess.Popen:
+    proc = subprocess.Popen([
+        sys.executable, str(ROOT / "bench" / "openai_stub.py"),
+        "--port", str(port), "--latency-ms", str(latency_ms),
+    ])
+    _wait_for(f"http://127.0.0.1:{port}/docs")
+    return proc
+
+
+def start_server(port: int) -> subprocess.Popen:
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+    )
+    _wait_for(f"http://127.0.0.1:{port}/health")
+    return proc
+
+
+def _wait_for(url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    sys.exit(f"{url} didn't come up within {timeout:.0f}s")
+
+
+async def main_async(args) -> list[dict]:
+    timeout = httpx.Timeout(120)
+    print_header()
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+            return await run(client, args, args.server_pid)
+
+    if args.spawn:
+        server = start_server(args.port)
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", timeout=timeout) as client:
+                return await run(client, args, server.pid)
+        finally:
+            server.terminate()
+            server.wait()
+
+    import main   # in-process: imported after the OPENAI_* env is set up
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+        return await run(client, args, os.getpid())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--user", type=int, default=1, help="bench user number to log in as")
+    parser.add_argument("--only", help="comma-separated scenario name prefixes, e.g. expenses,stats")
+    parser.add_argument("--url", help="benchmark an already running server")
+    parser.add_argument("--server-pid", type=int, help="with --url: pid to read peak RSS from")
+    parser.add_argument("--spawn", action="store_true", help="start uvicorn for the run")
+    parser.add_argument("--port", type=int, default=8010, help="port for --spawn")
+    parser.add_argument("--stub", action="store_true", help="start the OpenAI stub and run chat scenarios")
+    parser.add_argument("--stub-port", type=int, default=8765)
+    parser.add_argument("--stub-latency-ms", type=int, default=100)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    # Inherited by --spawn'ed servers, read by in-process imports
+    os.environ.setdefault("RATE_LIMIT", "0")
+
+    stub = None
+    if args.stub:
+        stub = start_stub(args.stub_port, args.stub_latency_ms)
+        # Inherited by --spawn'ed servers, read by in-process imports
+        os.environ["OPENAI_API_KEY"] = "stub"
+        os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.stub_port}/v1"
+    try:
+        results = asyncio.run(main_async(args))
+    finally:
+        if stub:
+            stub.terminate()
+            stub.wait()
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({
+            "mode":        "http" if args.url or args.spawn else "in-process",
+            "database":    os.getenv("DATABASE_URL", "sqlite:///./fintrack.db").split("@")[-1],
+            "concurrency": args.concurrency,
+            "results":     results,
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
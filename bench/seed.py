@@ -0,0 +1,151 @@
+"""
+Seed a database with synthetic users for benchmarks.
+
+    DATABASE_URL=sqlite:///./bench.db python bench/seed.py --users 2 --expenses 100000
+
+Users are bench1@example.com, bench2@example.com, … with password
+"bench-password". Each gets --categories categories and --expenses expenses
+spread over the --days days ending today. Rows are written with executemany
+batches of --batch rows and carry import fingerprints, so dedupe imports
+don't backfill them; the daily_spend rollup is rebuilt at the end.
+
+Seeding is deterministic for a given --seed. Re-running it for an existing
+user replaces that user's expenses and categories (--append keeps them).
+"""
+import argparse
+import logging
+import random
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import delete, insert, select
+
+from database import Base, engine
+import auth, importer, migrations, models, rollup
+
+logger = logging.getLogger("fintrack.bench.seed")
+
+PASSWORD = "bench-password"
+
+CATEGORIES = [
+    ("Food", "🍔"), ("Groceries", "🛒"), ("Transport", "🚌"), ("Coffee", "☕"),
+    ("Rent", "🏠"), ("Utilities", "💡"), ("Health", "💊"), ("Entertainment", "🎬"),
+    ("Clothes", "👕"), ("Travel", "✈️"), ("Gifts", "🎁"), ("Education", "📚"),
+    ("Sport", "🏋️"), ("Pets", "🐾"), ("Subscriptions", "🔁"), ("Other", "📦"),
+]
+MERCHANTS = [
+    "Starbucks", "Lidl", "Uber", "Amazon", "Netflix", "Spotify", "IKEA", "Shell",
+    "Pharmacy", "Cinema", "Bakery", "Market", "Bookstore", "Gym", "Airbnb", "Taxi",
+]
+WORDS = [
+    "coffee", "lunch", "dinner", "groceries", "ticket", "fuel", "monthly", "weekly",
+    "gift", "book", "medicine", "snacks", "breakfast", "parking", "repair", "tea",
+]
+
+
+def email(n: int) -> str:
+    return f"bench{n}@example.com"
+
+
+def _user(conn, n: int, password_hash: str) -> int:
+    user_id = conn.scalar(select(models.User.id).where(models.User.email == email(n)))
+    if user_id:
+        return user_id
+    user_id = conn.execute(insert(models.User).values(
+        email=email(n), username=f"bench{n}", password_hash=password_hash,
+    )).inserted_primary_key[0]
+    conn.execute(insert(models.UserSettings).values(user_id=user_id))
+    return user_id
+
+
+def _clear(conn, user_id: int) -> None:
+    for model in (models.Expense, models.ExpenseTombstone, models.DailySpend, models.Category):
+        conn.execute(delete(model).where(model.user_id == user_id))
+
+
+def _categories(conn, user_id: int, count: int) -> list[tuple[int, str]]:
+    rows = []
+    for i in range(count):
+        name, icon = CATEGORIES[i % len(CATEGORIES)]
+        if i >= len(CATEGORIES):
+            name = f"{name} {i // len(CATEGORIES) + 1}"
+        rows.append({"user_id": user_id, "name": name, "icon": icon, "budget": float(100 * (i % 5 + 1))})
+    if rows:
+        conn.execute(insert(models.Category), rows)
+    return conn.execute(
+        select(models.Category.id, models.Category.name).where(models.Category.user_id == user_id)
+    ).all()
+
+
+def _expense_rows(rng: random.Random, user_id: int, categories, count: int, days: int):
+    today = date.today()
+    for _ in range(count):
+        day = today - timedelta(days=rng.randrange(days))
+        amount = round(rng.lognormvariate(3, 1), 2)
+        description = f"{rng.choice(MERCHANTS)} {rng.choice(WORDS)}"
+        if rng.random() < 0.3:
+            description += f" {rng.choice(WORDS)}"
+        cat_id, cat_name = rng.choice(categories) if categories and rng.random() < 0.9 else (None, None)
+        yield {
+            "user_id":     user_id,
+            "category_id": cat_id,
+            "amount":      amount,
+            "currency":    "UAH",
+            "description": description,
+            "date":        day,
+            "fingerprint": importer.fingerprint(day, amount, "UAH", description, cat_name),
+            "version":     0,
+        }
+
+
+def seed(users: int, categories: int, expenses: int, days: int, batch: int, seed: int, append: bool) -> None:
+    Base.metadata.create_all(bind=engine)
+    migrations.run_migrations(engine)
+    password_hash = auth.hash_password(PASSWORD)   # one bcrypt, shared by all bench users
+
+    for n in range(1, users + 1):
+        rng = random.Random(seed * 1_000_003 + n)
+        with engine.begin() as conn:
+            user_id = _user(conn, n, password_hash)
+            if not append:
+                _clear(conn, user_id)
+            cats = _categories(conn, user_id, categories) if not append else conn.execute(
+                select(models.Category.id, models.Category.name).where(models.Category.user_id == user_id)
+            ).all()
+
+        started, written = time.perf_counter(), 0
+        rows = _expense_rows(rng, user_id, cats, expenses, days)
+        while written < expenses:
+            chunk = [row for _, row in zip(range(batch), rows)]
+            with engine.begin() as conn:
+                conn.execute(insert(models.Expense), chunk)
+            written += len(chunk)
+            logger.info("%s: %d/%d expenses", email(n), written, expenses)
+
+        with engine.begin() as conn:
+            rollup.rebuild(conn, user_id)
+        elapsed = time.perf_counter() - started
+        logger.info("%s seeded: %d expenses in %.1fs (%.0f rows/s)",
+                    email(n), written, elapsed, written / elapsed if elapsed else 0)
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1)
+    parser.add_argument("--categories", type=int, default=12, help="per user")
+    parser.add_argument("--expenses", type=int, default=10_000, help="per user")
+    parser.add_argument("--days", type=int, default=730, help="date spread, ending today")
+    parser.add_argument("--batch", type=int, default=10_000, help="rows per INSERT / commit")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--append", action="store_true", help="keep the users' existing data")
+    args = parser.parse_args()
+    seed(args.users, args.categories, args.expenses, args.days, args.batch, args.seed, args.append)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+CPU and allocation cost of serializing expense lists.
+
+Compares the two ways /api/expenses has produced a page of JSON:
+
+    orm   select(Expense) + selectinload(category) → validate each object into
+          schemas.ExpenseOut (from_attributes) → jsonable_encoder → json.dumps,
+          i.e. what FastAPI does for a response_model
+    lean  LIST_COLUMNS row tuples → expense_dicts → fastjson.dumps
+          (orjson when installed), the current list_expenses path
+
+For each page size it reports wall and CPU time per page (best of --repeat)
+and the tracemalloc peak while building one page:
+
+    python bench/serialization.py                         # temp SQLite, seeded
+    python bench/serialization.py --database-url sqlite:///./bench.db
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def measure(fn, repeat: int) -> dict:
+    fn()   # warm-up: statement caches, imports
+    wall, cpu = [], []
+    for _ in range(repeat):
+        w, c = time.perf_counter(), time.process_time()
+        fn()
+        wall.append(time.perf_counter() - w)
+        cpu.append(time.process_time() - c)
+
+    tracemalloc.start()
+    size = len(fn())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"wall_ms": min(wall) * 1000, "cpu_ms": min(cpu) * 1000, "peak_mb": peak / 2**20, "bytes": size}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="use this (already seeded) database instead of a temp SQLite file")
+    parser.add_argument("--expenses", type=int, default=10_000, help="rows to seed into the temp database")
+    parser.add_argument("--limits", default="100,1000,5000", help="page sizes to compare")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    tmp = None
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}/serialization.db"
+
+    sys.path.insert(0, str(ROOT))
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+    import database, fastjson, models, schemas
+    from routers.expenses import LIST_COLUMNS, expense_dicts
+    import seed
+
+    if tmp:
+        seed.seed(users=1, categories=12, expenses=args.expenses, days=730, batch=5000, seed=42, append=False)
+
+    with database.SessionLocal() as db:
+        user_id = db.scalar(select(models.User.id).where(models.User.email == seed.email(1)))
+    if user_id is None:
+        sys.exit(f"{seed.email(1)} not found — seed the database with bench/seed.py first")
+
+    adapter = TypeAdapter(List[schemas.ExpenseOut])
+    order = (models.Expense.date.desc(), models.Expense.id.desc())
+
+    def orm(limit: int):
+        def run() -> bytes:
+            with database.SessionLocal() as db:
+                objs = db.scalars(
+                    select(models.Expense)
+                    .options(selectinload(models.Expense.category))
+                    .where(models.Expense.user_id == user_id)
+                    .order_by(*order).limit(limit)
+                ).all()
+                validated = adapter.validate_python(objs, from_attributes=True)
+                return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode()
+        return run
+
+    def lean(limit: int):
+        def run() -> bytes:
+            with database.SessionLocal() as db:
+                rows = db.execute(
+                    LIST_COLUMNS.where(models.Expense.user_id == user_id).order_by(*order).limit(limit)
+                ).all()
+                return fastjson.dumps(expense_dicts(rows))
+        return run
+
+    encoder = "orjson" if fastjson.orjson else "json (install orjson for the fast encoder)"
+    print(f"encoder: {encoder}\n")
+    print(f"{'limit':>6}  {'path':<5}{'wall ms':>10}{'cpu ms':>10}{'peak MB':>10}{'KB':>9}")
+    for limit in (int(x) for x in args.limits.split(",")):
+        results = {name: measure(fn(limit), args.repeat) for name, fn in (("orm", orm), ("lean", lean))}
+        for name, r in results.items():
+            print(f"{limit:>6}  {name:<5}{r['wall_ms']:>10.1f}{r['cpu_ms']:>10.1f}{r['peak_mb']:>10.2f}{r['bytes'] / 1024:>9.0f}")
+        o, l = results["orm"], results["lean"]
+        print(f"{'':>6}  {'':<5}{o['wall_ms'] / l['wall_ms']:>9.1f}×{o['cpu_ms'] / l['cpu_ms']:>9.1f}×"
+              f"{o['peak_mb'] / l['peak_mb']:>9.1f}×")
+
+
+if __name__ == "__main__":
+    main()
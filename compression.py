@@ -0,0 +1,231 @@
+"""
+Response compression.
+
+CompressionMiddleware brotli-compresses — or gzips, for clients (or
+installs without the `brotli` package) that can't use br — responses whose
+client sent a matching Accept-Encoding. Only compressible content types are touched, and only when
+the body reaches COMPRESSION_MIN_SIZE; streamed responses (NDJSON/CSV
+exports) are compressed chunk by chunk as they go out. Server-sent events
+are never compressed, since buffering would hold events back.
+
+Opt a route out with the @no_compression decorator. Bytes before/after and
+the CPU time spent compressing are kept per route and rendered for /metrics.
+
+Unlike Starlette's GZipMiddleware this adds brotli, the per-route opt-out
+and the metrics.
+"""
+import os
+import threading
+import time
+import zlib
+from collections import defaultdict
+
+try:
+    import brotli
+except ImportError:   # not installed: gzip only
+    brotli = None
+
+COMPRESSION_ENABLED        = os.getenv("COMPRESSION", "1") != "0"
+COMPRESSION_MIN_SIZE       = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))     # bytes
+COMPRESSION_GZIP_LEVEL     = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))  # 0-11; >5 is slow for live traffic
+
+COMPRESSIBLE = ("application/json", "application/x-ndjson", "text/csv", "text/plain", "text/html")
+
+
+def no_compression(endpoint):
+    """Route decorator: never compress this endpoint's responses."""
+    endpoint.no_compression = True
+    return endpoint
+
+
+def _accepted(header: str) -> set[str]:
+    accepted = set()
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+def choose_encoding(accept_encoding: str):
+    accepted = _accepted(accept_encoding)
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def _vary(headers) -> bytes:
+    """The response's Vary value(s) merged into one, plus Accept-Encoding."""
+    values = [v.strip() for k, value in headers if k.lower() == b"vary" for v in value.split(b",") if v.strip()]
+    if not any(v == b"*" or v.lower() == b"accept-encoding" for v in values):
+        values.append(b"Accept-Encoding")
+    return b", ".join(values)
+
+
+class _Compressor:
+    """Incremental gzip/brotli with the CPU time it costs."""
+
+    def __init__(self, encoding: str):
+        self.cpu = 0.0
+        if encoding == "br":
+            c = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+            self._compress, self._finish = c.process, c.finish
+        else:
+            c = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)   # gzip container
+            self._compress, self._finish = c.compress, c.flush
+
+    def compress(self, data: bytes) -> bytes:
+        start = time.thread_time()
+        out = self._compress(data)
+        self.cpu += time.thread_time() - start
+        return out
+
+    def finish(self) -> bytes:
+        start = time.thread_time()
+        out = self._finish()
+        self.cpu += time.thread_time() - start
+        return out
+
+
+# ─────────────────────────── METRICS ───────────────────────────
+
+class Stats:
+    def __init__(self):
+        self._lock     = threading.Lock()
+        self.responses = defaultdict(int)     # (route, encoding)
+        self.bytes_in  = defaultdict(int)
+        self.bytes_out = defaultdict(int)
+        self.cpu       = defaultdict(float)
+
+    def record(self, route: str, encoding: str, bytes_in: int, bytes_out: int, cpu: float) -> None:
+        key = (route, encoding)
+        with self._lock:
+            self.responses[key] += 1
+            self.bytes_in[key]  += bytes_in
+            self.bytes_out[key] += bytes_out
+            self.cpu[key]       += cpu
+
+    def summary(self) -> dict:
+        with self._lock:
+            bytes_in, bytes_out = sum(self.bytes_in.values()), sum(self.bytes_out.values())
+            return {
+                "responses": sum(self.responses.values()),
+                "bytes_in":  bytes_in,
+                "bytes_out": bytes_out,
+                "ratio":     round(bytes_in / bytes_out, 2) if bytes_out else None,
+                "cpu_ms":    round(sum(self.cpu.values()) * 1000, 1),
+            }
+
+    def render(self) -> str:
+        series = [
+            ("fintrack_compressed_responses_total", "Compressed responses", self.responses),
+            ("fintrack_compression_bytes_in_total", "Bytes before compression", self.bytes_in),
+            ("fintrack_compression_bytes_out_total", "Bytes after compression", self.bytes_out),
+            ("fintrack_compression_cpu_seconds_total", "CPU time spent compressing", self.cpu),
+        ]
+        lines = []
+        with self._lock:
+            for name, help_text, values in series:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} counter")
+                for (route, encoding), value in sorted(values.items()):
+                    lines.append(f'{name}{{route="{route}",encoding="{encoding}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+stats = Stats()
+
+
+def render() -> str:
+    return stats.render()
+
+
+# ─────────────────────────── MIDDLEWARE ───────────────────────────
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not COMPRESSION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        compressor = None
+        bytes_in = bytes_out = 0
+
+        def wanted(message) -> bool:
+            if getattr(scope.get("endpoint"), "no_compression", False):
+                return False
+            if message["status"] < 200 or message["status"] in (204, 304):
+                return False
+            response_headers = {k.lower(): v for k, v in message.get("headers", [])}
+            if b"content-encoding" in response_headers:
+                return False
+            content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+            return content_type.startswith(COMPRESSIBLE)
+
+        async def send_compressed(body: bytes, more_body: bool):
+            nonlocal bytes_in, bytes_out
+            bytes_in += len(body)
+            out = compressor.compress(body)
+            if not more_body:
+                out += compressor.finish()
+            bytes_out += len(out)
+            if out or not more_body:
+                await send({"type": "http.response.body", "body": out, "more_body": more_body})
+
+        async def send_wrapper(message):
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                if wanted(message):
+                    start_message = message     # held until we see how big the body is
+                else:
+                    await send(message)
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body, more_body = message.get("body", b""), message.get("more_body", False)
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    await send(start_message)
+                    start_message = None
+                    await send(message)
+                    return
+                compressor = _Compressor(encoding)
+                response_headers = [
+                    (k, v) for k, v in start_message.get("headers", [])
+                    if k.lower() not in (b"content-length", b"vary")
+                ]
+                response_headers += [
+                    (b"content-encoding", encoding.encode()),
+                    (b"vary", _vary(start_message.get("headers", []))),
+                ]
+                await send({**start_message, "headers": response_headers})
+            await send_compressed(body, more_body)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if compressor is not None:
+                route = getattr(scope.get("route"), "path", None) or "unmatched"
+                stats.record(route, encoding, bytes_in, bytes_out, compressor.cpu)
@@ -1,18 +1,141 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./fintrack.db")
 
+
+def _async_url(url: str) -> str:
+    """Same database, async driver: aiosqlite for SQLite, asyncpg for Postgres."""
+    scheme, rest = url.split("://", 1)
+    backend = scheme.split("+")[0]
+    if backend == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if backend in ("postgres", "postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+
+# Override if the async driver needs a different URL (e.g. asyncpg SSL params)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Pool sizing applies to each engine (sync and async) in each worker process
+DB_POOL_SIZE     = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW  = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT  = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE  = int(os.getenv("DB_POOL_RECYCLE", "1800"))   # seconds, -1 = never
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") != "0"
+
+# SQLite only, set on every new connection
+SQLITE_JOURNAL_MODE    = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS     = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE       = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+
+# ── pool metrics ──
+
+class _TimedPoolMixin:
+    """Queue pool that records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts  = 0
+        self.timeouts   = 0
+        self.wait_total = 0.0
+        self.wait_max   = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts  += 1
+            self.wait_total += waited
+            self.wait_max    = max(self.wait_max, waited)
+
+    def stats(self) -> dict:
+        return {
+            "size":         self.size(),
+            "checked_out":  self.checkedout(),
+            "overflow":     max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts":    self.checkouts,
+            "timeouts":     self.timeouts,
+            "wait_avg_ms":  round(self.wait_total / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+            "wait_max_ms":  round(self.wait_max * 1000, 3),
+        }
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _pool_args(url: str, poolclass) -> dict:
+    # In-memory SQLite gets a single shared connection, not a queue pool
+    if url.startswith("sqlite") and (":memory:" in url or url.split("://", 1)[1] in ("", "/")):
+        return {}
+    return {
+        "poolclass":     poolclass,
+        "pool_size":     DB_POOL_SIZE,
+        "max_overflow":  DB_MAX_OVERFLOW,
+        "pool_timeout":  DB_POOL_TIMEOUT,
+        "pool_recycle":  DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def _sqlite_pragmas(dbapi_conn, connection_record) -> None:
+    cursor = dbapi_conn.cursor()
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+
 # SQLite needs check_same_thread=False, other DBs don't
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
+connect_args = {"check_same_thread": False} if IS_SQLITE else {}
 
-engine = create_engine(DATABASE_URL, connect_args=connect_args)
+# Sync engine — migrations and the bulk export/import endpoints
+engine = create_engine(DATABASE_URL, connect_args=connect_args, **_pool_args(DATABASE_URL, TimedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine — API routers. expire_on_commit=False: attributes read after a
+# commit must not trigger implicit (sync) reloads.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_args(ASYNC_DATABASE_URL, TimedAsyncQueuePool))
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _sqlite_pragmas)
+
+
+def pool_stats() -> dict:
+    """Checkout/wait/overflow counters for both engines' pools."""
+    def one(e: Engine) -> dict:
+        pool = e.pool
+        return pool.stats() if isinstance(pool, _TimedPoolMixin) else {"status": pool.status()}
+    return {"sync": one(engine), "async": one(async_engine.sync_engine)}
+
 
 class Base(DeclarativeBase):
     pass
@@ -24,3 +147,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
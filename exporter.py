@@ -0,0 +1,97 @@
+"""
+Streaming export (NDJSON / CSV).
+
+Rows are read through a server-side cursor in batches of BATCH_SIZE and
+written out as they arrive, so peak memory stays flat however many expenses
+a user has. Each generator opens its own session: the request-scoped one from
+get_db may already be closed while the response body is still streaming.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Iterator
+
+from sqlalchemy import select
+
+from database import SessionLocal
+import models
+
+BATCH_SIZE = 1000
+
+EXPENSE_COLUMNS = ["id", "date", "amount", "currency", "description", "category_id", "category", "created_at"]
+
+
+def _expense_rows(db, user_id: int):
+    stmt = (
+        select(
+            models.Expense.id,
+            models.Expense.date,
+            models.Expense.amount,
+            models.Expense.currency,
+            models.Expense.description,
+            models.Expense.category_id,
+            models.Category.name.label("category"),
+            models.Expense.created_at,
+        )
+        .outerjoin(models.Category, models.Category.id == models.Expense.category_id)
+        .where(models.Expense.user_id == user_id)
+        .order_by(models.Expense.date.desc(), models.Expense.id.desc())
+        .execution_options(yield_per=BATCH_SIZE)
+    )
+    return db.execute(stmt)
+
+
+def _plain(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def _line(record: dict) -> str:
+    return json.dumps({k: _plain(v) for k, v in record.items()}, ensure_ascii=False) + "\n"
+
+
+def stream_ndjson(user_id: int) -> Iterator[str]:
+    """
+    One JSON object per line, tagged with "type":
+    categories first, then settings, then expenses (newest first).
+    """
+    with SessionLocal() as db:
+        categories = db.execute(
+            select(models.Category).where(models.Category.user_id == user_id)
+        ).scalars()
+        yield "".join(
+            _line({
+                "type": "category", "id": c.id, "name": c.name, "icon": c.icon,
+                "color": c.color, "budget": c.budget, "created_at": c.created_at,
+            })
+            for c in categories
+        )
+
+        settings = db.execute(
+            select(models.UserSettings).where(models.UserSettings.user_id == user_id)
+        ).scalar_one_or_none()
+        if settings:
+            yield _line({
+                "type": "settings", "currency": settings.currency,
+                "lang": settings.lang, "theme": settings.theme,
+            })
+
+        for batch in _expense_rows(db, user_id).mappings().partitions():
+            yield "".join(_line({"type": "expense", **row}) for row in batch)
+
+
+def stream_csv(user_id: int) -> Iterator[str]:
+    """Expenses only, one row per expense, with the category name inlined."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPENSE_COLUMNS)
+    yield buf.getvalue()
+
+    with SessionLocal() as db:
+        for batch in _expense_rows(db, user_id).partitions():
+            buf.seek(0)
+            buf.truncate()
+            writer.writerows([_plain(v) for v in row] for row in batch)
+            yield buf.getvalue()
@@ -0,0 +1,195 @@
+"""
+Request-level performance instrumentation.
+
+InstrumentationMiddleware times every request and, through SQLAlchemy cursor
+events, counts the queries it ran and the time spent in them. Per route
+(the path template, e.g. /api/expenses/{exp_id}) it keeps:
+
+    fintrack_request_duration_seconds   histogram
+    fintrack_request_db_queries         histogram — an N+1 shows up as a shift
+                                                    into the high buckets
+    fintrack_request_db_seconds_total   counter
+    fintrack_response_bytes_total       counter
+    fintrack_requests_total             counter, by status
+
+render() returns them in Prometheus text format (GET /metrics). Numbers are
+per worker process. Each response also gets a Server-Timing header, e.g.
+
+    Server-Timing: db;dur=3.2;desc="4 queries", app;dur=11.8
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS   = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    """Mutable so that threadpool copies of the request context share it."""
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("fintrack_request_stats", default=None)
+
+
+# ─────────────────────────── DB EVENTS ───────────────────────────
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    stats = _current.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+
+def _handle_error(exception_context) -> None:
+    # after_cursor_execute doesn't fire for a failed statement
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Attribute queries on `engine` (for async engines: .sync_engine) to the current request."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+# ─────────────────────────── REGISTRY ───────────────────────────
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts  = [0] * (len(buckets) + 1)   # last slot is +Inf
+        self.sum     = 0.0
+        self.count   = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum   += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock     = threading.Lock()
+        self.latency   = defaultdict(lambda: _Histogram(LATENCY_BUCKETS))   # (method, route)
+        self.queries   = defaultdict(lambda: _Histogram(QUERY_BUCKETS))     # (method, route)
+        self.db_time   = defaultdict(float)                                 # (method, route)
+        self.bytes     = defaultdict(int)                                   # (method, route)
+        self.requests  = defaultdict(int)                                   # (method, route, status)
+
+    def record(self, method: str, route: str, status: int, duration: float,
+               stats: RequestStats, size: int) -> None:
+        key = (method, route)
+        with self._lock:
+            self.latency[key].observe(duration)
+            self.queries[key].observe(stats.queries)
+            self.db_time[key] += stats.db_time
+            self.bytes[key]   += size
+            self.requests[(method, route, status)] += 1
+
+    def render(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            _histogram(lines, "fintrack_request_duration_seconds", "Request latency", self.latency)
+            _histogram(lines, "fintrack_request_db_queries", "DB queries per request", self.queries)
+            _counter(lines, "fintrack_request_db_seconds_total", "Time spent in DB queries", self.db_time)
+            _counter(lines, "fintrack_response_bytes_total", "Response body bytes", self.bytes)
+            lines.append("# HELP fintrack_requests_total Requests served")
+            lines.append("# TYPE fintrack_requests_total counter")
+            for (method, route, status), n in sorted(self.requests.items()):
+                lines.append(f'fintrack_requests_total{{method="{method}",route="{route}",status="{status}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+def _labels(method: str, route: str) -> str:
+    return f'method="{method}",route="{route}"'
+
+
+def _histogram(lines: list[str], name: str, help_text: str, series: dict) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for (method, route), h in sorted(series.items()):
+        labels = _labels(method, route)
+        cumulative = 0
+        for bound, n in zip(h.buckets + ("+Inf",), h.counts):
+            cumulative += n
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {h.sum:.6f}")
+        lines.append(f"{name}_count{{{labels}}} {h.count}")
+
+
+def _counter(lines: list[str], name: str, help_text: str, series: dict) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} counter")
+    for (method, route), value in sorted(series.items()):
+        lines.append(f"{name}{{{_labels(method, route)}}} {value}")
+
+
+registry = Registry()
+
+
+def render() -> str:
+    return registry.render()
+
+
+# ─────────────────────────── MIDDLEWARE ───────────────────────────
+
+class InstrumentationMiddleware:
+    """Pure ASGI, so streamed responses are measured until their last chunk."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        status, size = 500, 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = (
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries", '
+                    f"app;dur={(time.perf_counter() - start) * 1000:.1f}"
+                )
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"server-timing", timing.encode())]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            # Template, not the raw path: /api/expenses/{exp_id}, not one series per id
+            label = getattr(route, "path", None) or "unmatched"
+            registry.record(scope["method"], label, status, time.perf_counter() - start, stats, size)
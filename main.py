@@ -1,18 +1,36 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Depends, File, HTTPException, Query, UploadFile, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List
 
-from database import engine, Base, get_db
-import models, schemas, auth
+from database import engine, async_engine, Base, get_db, pool_stats
+import models, schemas, auth, migrations, exporter, importer, search, instrumentation, compression, ratelimit
 from routers import auth as auth_router
 from routers import categories as categories_router
 from routers import expenses as expenses_router
 from routers import settings as settings_router
 from routers import chat as chat_router
+from routers import stats as stats_router
+from routers import sync as sync_router
 
-# Create all DB tables on startup
+# Create all DB tables on startup, then bring older schemas up to date
 Base.metadata.create_all(bind=engine)
+if os.getenv("AUTO_MIGRATE", "1") != "0":
+    migrations.run_migrations(engine)
+migrations.check_indexes(engine)
+search.detect(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Shutdown: release the pooled model client and async DB connections
+    await chat_router.close_client()
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="FinTrack API",
@@ -20,6 +38,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
 )
 
 # CORS — allow all origins (API is protected by JWT tokens)
@@ -29,14 +48,26 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Server-Timing", "Retry-After"],
 )
 
+# gzip/brotli for JSON, NDJSON and CSV bodies over COMPRESSION_MIN_SIZE;
+# sits inside instrumentation so response size metrics are bytes on the wire
+app.add_middleware(compression.CompressionMiddleware)
+
+# Per-route latency / DB query / response size metrics, served at /metrics
+instrumentation.instrument_engine(engine)
+instrumentation.instrument_engine(async_engine.sync_engine)
+app.add_middleware(instrumentation.InstrumentationMiddleware)
+
 # Register routers
 app.include_router(auth_router.router)
 app.include_router(categories_router.router)
 app.include_router(expenses_router.router)
 app.include_router(settings_router.router)
 app.include_router(chat_router.router)
+app.include_router(stats_router.router)
+app.include_router(sync_router.router)
 
 
 # ─────────────────────────── ROOT / HEALTH ───────────────────────────
@@ -51,14 +82,53 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", tags=["Health"], response_class=PlainTextResponse)
+def metrics():
+    """Prometheus text format; see instrumentation.py and compression.py."""
+    return PlainTextResponse(instrumentation.render() + compression.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/stats", tags=["Health"])
+def health_stats():
+    """In-process counters for caches and pools."""
+    return {
+        "user_cache":    auth.user_cache.stats(),
+        "password_pool": auth.password_pool.stats(),
+        "db_pool":       pool_stats(),
+        "compression":   compression.stats.summary(),
+        "rate_limit":    ratelimit.limiter.stats(),
+    }
+
+
 # ─────────────────────────── EXPORT / IMPORT ───────────────────────────
 
-@app.get("/api/export", response_model=schemas.ExportData, tags=["Data"])
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv":    "text/csv; charset=utf-8",
+}
+
+
+@app.get("/api/export", response_model=schemas.ExportData, tags=["Data"],
+         dependencies=[Depends(ratelimit.limit(cost=10, concurrent=True))])
 def export_data(
+    format: str = Query("json", pattern="^(json|ndjson|csv)$", description="json | ndjson | csv"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
-    """Export all user data (categories + expenses + settings) as JSON."""
+    """
+    Export all user data (categories + expenses + settings).
+
+    `json` builds one document in memory. `ndjson` and `csv` (expenses only)
+    are streamed in batches and should be preferred for large accounts.
+    """
+    if format != "json":
+        stream = exporter.stream_ndjson if format == "ndjson" else exporter.stream_csv
+        return StreamingResponse(
+            stream(current_user.id),
+            media_type=EXPORT_MEDIA_TYPES[format],
+            headers={"Content-Disposition": f'attachment; filename="fintrack-export.{format}"'},
+        )
+
     categories = (
         db.query(models.Category)
         .filter(models.Category.user_id == current_user.id)
@@ -83,53 +153,46 @@ def export_data(
     )
 
 
-@app.post("/api/import", tags=["Data"])
+@app.post("/api/import", tags=["Data"], dependencies=[Depends(ratelimit.limit(cost=20, concurrent=True))])
 def import_data(
     data: schemas.ImportData,
+    chunk_size: int = Query(importer.IMPORT_CHUNK_SIZE, ge=1, le=50_000),
+    dedupe: bool = Query(False, description="Skip expenses identical to ones already stored"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
     """
     Import categories and expenses. Existing data is NOT deleted.
     Categories are matched by name — existing ones are reused, new ones are created.
+    Expenses are inserted and committed in chunks of `chunk_size`. With `dedupe`,
+    rows matching an existing expense (date, amount, currency, description,
+    category) are skipped, so the same file can be imported repeatedly.
     """
-    # Build map of existing categories by name
-    existing = {
-        c.name: c
-        for c in db.query(models.Category)
-        .filter(models.Category.user_id == current_user.id)
-        .all()
-    }
-
-    # Import categories
-    cat_id_map: dict[str, int] = {}   # old name → new DB id
-    new_cats = 0
+    imp = importer.BulkImporter(db, current_user.id, chunk_size, dedupe)
     for cat_data in data.categories:
-        if cat_data.name in existing:
-            cat_id_map[cat_data.name] = existing[cat_data.name].id
-        else:
-            cat = models.Category(**cat_data.model_dump(), user_id=current_user.id)
-            db.add(cat)
-            db.flush()
-            cat_id_map[cat_data.name] = cat.id
-            new_cats += 1
-
-    # Import expenses
-    new_exps = 0
+        imp.add_category(cat_data.model_dump())
     for exp_data in data.expenses:
-        exp = models.Expense(
-            user_id=current_user.id,
-            amount=exp_data.amount,
-            currency=exp_data.currency,
-            description=exp_data.description,
-            date=exp_data.date,
-            category_id=exp_data.category_id,
-        )
-        db.add(exp)
-        new_exps += 1
+        imp.add_expense(exp_data.model_dump())
+    return imp.finish()
 
-    db.commit()
-    return {
-        "imported_categories": new_cats,
-        "imported_expenses": new_exps,
-    }
+
+@app.post("/api/import/stream", tags=["Data"], dependencies=[Depends(ratelimit.limit(cost=20, concurrent=True))])
+def import_stream(
+    file: UploadFile = File(..., description="NDJSON or CSV in the /api/export format"),
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson | csv"),
+    chunk_size: int = Query(importer.IMPORT_CHUNK_SIZE, ge=1, le=50_000),
+    dedupe: bool = Query(False, description="Skip expenses identical to ones already stored"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """
+    Import a streamed NDJSON/CSV upload without parsing it into memory first.
+    Invalid rows are skipped and reported; valid ones are committed chunk by chunk.
+    """
+    imp = importer.BulkImporter(db, current_user.id, chunk_size, dedupe)
+    lines = importer.text_stream(file.file)
+    if format == "csv":
+        importer.import_csv(imp, lines)
+    else:
+        importer.import_ndjson(imp, lines)
+    return imp.finish()
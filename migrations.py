@@ -0,0 +1,207 @@
+"""
+Idempotent schema migrations.
+
+Base.metadata.create_all() only creates tables that don't exist yet — it never
+adds indexes or changes column types on existing tables. The steps below bring
+an older database up to date with models.py and are safe to re-run.
+
+Run automatically on startup (disable with AUTO_MIGRATE=0) or by hand:
+
+    python migrations.py
+"""
+import logging
+import re
+from datetime import date, datetime
+from typing import Optional
+from sqlalchemy import Date, func, inspect, select, text, update
+from sqlalchemy.engine import Connection, Engine
+
+from database import Base, engine as default_engine
+import models, rollup, search, versions
+
+logger = logging.getLogger("fintrack.migrations")
+
+
+# ─────────────────────────── STEPS ───────────────────────────
+
+# Legacy free-text dates: 2026-2-3, 2026/02/03, 2026-02-03T10:00, 03.02.2026
+_YMD = re.compile(r"(\d{4})[-/.](\d{1,2})[-/.](\d{1,2})(?:[T ].*)?")
+_DMY = re.compile(r"(\d{1,2})\.(\d{1,2})\.(\d{4})")
+
+
+def _parse_legacy_date(raw: str) -> Optional[date]:
+    raw = raw.strip()
+    try:
+        if m := _YMD.fullmatch(raw):
+            return date(int(m[1]), int(m[2]), int(m[3]))
+        if m := _DMY.fullmatch(raw):
+            return date(int(m[3]), int(m[2]), int(m[1]))
+    except ValueError:   # 2026-02-30
+        pass
+    return None
+
+
+def _normalize_expense_dates(conn: Connection) -> None:
+    """
+    expenses.date used to be free text, so old rows can hold dates that
+    aren't YYYY-MM-DD — reading them as DATE fails. Rewrite the parseable
+    ones; the rest get their created_at day and the raw value is kept in
+    expense_date_quarantine.
+    """
+    if conn.dialect.name == "sqlite":
+        # date() returns NULL or a different string for anything non-canonical;
+        # the no-op modifier makes it normalize day overflow (02-30 → 03-02) too
+        rows = conn.execute(text(
+            "SELECT id, user_id, date FROM expenses WHERE date(date, '+0 days') IS NOT date"
+        )).all()
+    elif conn.dialect.name == "postgresql":
+        col = next(c for c in inspect(conn).get_columns("expenses") if c["name"] == "date")
+        if isinstance(col["type"], Date):
+            return
+        rows = [
+            r for r in conn.execute(text("SELECT id, user_id, date FROM expenses")).all()
+            if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", r.date) or _parse_legacy_date(r.date) is None
+        ]
+    else:
+        return
+    if not rows:
+        return
+
+    e = models.Expense.__table__
+    quarantined = []
+    for row in rows:
+        day = _parse_legacy_date(str(row.date))
+        if day is None:
+            created_at = conn.scalar(select(e.c.created_at).where(e.c.id == row.id))
+            day = (created_at or datetime.utcnow()).date()
+            quarantined.append({"expense_id": row.id, "user_id": row.user_id, "raw_date": str(row.date), "replaced_with": day})
+        conn.execute(update(e).where(e.c.id == row.id).values(date=day))
+
+    if quarantined:
+        conn.execute(models.ExpenseDateQuarantine.__table__.insert(), quarantined)
+        logger.warning(
+            "%d expense(s) had unparseable dates and were given their created_at day; "
+            "the raw values are in expense_date_quarantine: %s",
+            len(quarantined), ", ".join(f"#{q['expense_id']} {q['raw_date']!r}" for q in quarantined[:20]),
+        )
+    logger.info("Normalized %d legacy expense dates", len(rows) - len(quarantined))
+
+    # An existing rollup was keyed by the raw strings; if there is none yet,
+    # _backfill_daily_spend builds it from the fixed rows. Sync clients need
+    # the new dates either way
+    has_rollup = conn.scalar(select(models.DailySpend.user_id).limit(1)) is not None
+    for user_id in {row.user_id for row in rows}:
+        if has_rollup:
+            rollup.rebuild(conn, user_id)
+        version = versions.bump(conn, user_id)
+        conn.execute(
+            update(e).where(e.c.id.in_([r.id for r in rows if r.user_id == user_id]))
+            .values(version=version, updated_at=datetime.utcnow())
+        )
+
+
+def _expense_date_to_date_type(conn: Connection) -> None:
+    """expenses.date used to be VARCHAR. SQLite stores DATE as the same
+    'YYYY-MM-DD' text, so only Postgres needs the column converted."""
+    if conn.dialect.name != "postgresql":
+        return
+    col = next(c for c in inspect(conn).get_columns("expenses") if c["name"] == "date")
+    if isinstance(col["type"], Date):
+        return
+    logger.info("Converting expenses.date to DATE")
+    conn.execute(text("ALTER TABLE expenses ALTER COLUMN date TYPE DATE USING date::date"))
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    """Add nullable columns that were introduced after a table was created."""
+    insp = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name in existing:
+                continue
+            if not col.nullable:
+                raise RuntimeError(f"Can't add NOT NULL column {table.name}.{col.name} automatically")
+            logger.info("Adding column %s.%s", table.name, col.name)
+            col_type = col.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{col.name}" {col_type}'))
+
+
+def _create_missing_indexes(conn: Connection) -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+def _backfill_daily_spend(conn: Connection) -> None:
+    """daily_spend was added after expenses — fill it once from raw rows."""
+    if conn.scalar(select(models.DailySpend.user_id).limit(1)) is not None:
+        return
+    if conn.scalar(select(models.Expense.id).limit(1)) is None:
+        return
+    logger.info("Backfilling daily_spend from expenses")
+    rollup.rebuild(conn)
+
+
+def _backfill_expense_versions(conn: Connection) -> None:
+    """Rows from before change tracking: version 0, i.e. part of any full sync."""
+    e = models.Expense.__table__
+    result = conn.execute(
+        update(e).where(e.c.version.is_(None))
+        .values(version=0, updated_at=func.coalesce(e.c.updated_at, e.c.created_at))
+    )
+    if result.rowcount:
+        logger.info("Stamped %d expenses with version 0", result.rowcount)
+
+
+def _create_search_index(conn: Connection) -> None:
+    """FTS5 table + triggers on SQLite, GIN tsvector index on Postgres."""
+    search.create_index(conn)
+
+
+STEPS = [
+    _add_missing_columns,
+    _normalize_expense_dates,
+    _expense_date_to_date_type,
+    _create_missing_indexes,
+    _backfill_daily_spend,
+    _backfill_expense_versions,
+    _create_search_index,
+]
+
+
+# ─────────────────────────── API ───────────────────────────
+
+def run_migrations(engine: Engine = default_engine) -> None:
+    """Apply every step in order, each in its own transaction."""
+    for step in STEPS:
+        with engine.begin() as conn:
+            step(conn)
+
+
+def missing_indexes(engine: Engine = default_engine) -> list[str]:
+    """Names of indexes declared in models.py that the database doesn't have."""
+    insp = inspect(engine)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {ix["name"] for ix in insp.get_indexes(table.name)}
+        missing += [ix.name for ix in table.indexes if ix.name not in existing]
+    return missing
+
+
+def check_indexes(engine: Engine = default_engine) -> list[str]:
+    """Log a warning for every missing index and return their names."""
+    missing = missing_indexes(engine)
+    for name in missing:
+        logger.warning("Missing index %s — run `python migrations.py`", name)
+    return missing
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    Base.metadata.create_all(bind=default_engine)
+    run_migrations()
+    if not check_indexes():
+        logger.info("Schema is up to date")
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -32,6 +32,10 @@ class Category(Base):
     user     = relationship("User",     back_populates="categories")
     expenses = relationship("Expense",  back_populates="category")
 
+    __table_args__ = (
+        Index("ix_categories_user_id", "user_id"),
+    )
+
 
 class Expense(Base):
     __tablename__ = "expenses"
@@ -42,12 +46,76 @@ class Expense(Base):
     amount      = Column(Float, nullable=False)
     currency    = Column(String, default="UAH")
     description = Column(String, nullable=False)
-    date        = Column(String, nullable=False)   # YYYY-MM-DD
+    date        = Column(Date, nullable=False)     # stored as YYYY-MM-DD on SQLite
+    fingerprint = Column(String(64), nullable=True) # import content hash, see importer.fingerprint
     created_at  = Column(DateTime, default=datetime.utcnow)
+    updated_at  = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version     = Column(Integer, nullable=True)    # user data version of the last write, see versions.py
 
     user     = relationship("User",     back_populates="expenses")
     category = relationship("Category", back_populates="expenses")
 
+    # Every list/aggregate query filters by user and ranges over date
+    __table_args__ = (
+        Index("ix_expenses_user_date_id",       "user_id", "date", "id"),
+        Index("ix_expenses_user_category_date", "user_id", "category_id", "date"),
+        Index("ix_expenses_user_fingerprint",   "user_id", "fingerprint"),
+        Index("ix_expenses_user_version_id",    "user_id", "version", "id"),
+    )
+
+
+class ExpenseTombstone(Base):
+    """Left behind by a deleted expense so /api/sync can report the delete."""
+    __tablename__ = "expense_tombstones"
+
+    id         = Column(Integer, primary_key=True)
+    user_id    = Column(Integer, ForeignKey("users.id"), nullable=False)
+    expense_id = Column(Integer, nullable=False)
+    version    = Column(Integer, nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_expense_tombstones_user_version", "user_id", "version"),
+    )
+
+
+class ExpenseDateQuarantine(Base):
+    """
+    Legacy expense dates (from when date was free text) that couldn't be
+    parsed. migrations.py keeps the raw value here and gives the expense its
+    created_at day instead, so it can be fixed by hand.
+    """
+    __tablename__ = "expense_date_quarantine"
+
+    expense_id     = Column(Integer, primary_key=True)
+    user_id        = Column(Integer, ForeignKey("users.id"), nullable=False)
+    raw_date       = Column(String, nullable=False)
+    replaced_with  = Column(Date, nullable=False)
+    quarantined_at = Column(DateTime, default=datetime.utcnow)
+
+
+class DailySpend(Base):
+    """
+    Pre-aggregated spending per (user, category, day), maintained by rollup.py.
+    category_id 0 stands for "no category", so it can be part of the key.
+    """
+    __tablename__ = "daily_spend"
+
+    # Key order (user_id, day, category_id) serves "user + date range" scans
+    user_id     = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day         = Column(Date,    primary_key=True)
+    category_id = Column(Integer, primary_key=True, autoincrement=False)
+    total       = Column(Float,   nullable=False, default=0)
+    count       = Column(Integer, nullable=False, default=0)
+
+
+class UserDataVersion(Base):
+    """Bumped on every write to a user's data; see versions.py."""
+    __tablename__ = "user_data_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
 
 class UserSettings(Base):
     __tablename__ = "user_settings"
@@ -0,0 +1,186 @@
+"""
+Per-user rate limits and concurrency caps for expensive routes.
+
+Each user has a token bucket holding up to RATE_LIMIT_BURST tokens, refilled
+at RATE_LIMIT_RATE tokens per second. A limited route spends its cost from
+the bucket (a chat turn costs more than a batch edit), and answers 429 with
+Retry-After once the bucket can't cover it. Routes that hold a worker for a
+long time (chat, import, export) also count against RATE_LIMIT_CONCURRENCY
+requests in flight per user.
+
+    @router.post("", dependencies=[Depends(ratelimit.limit(cost=10, concurrent=True))])
+
+Buckets live in process memory by default, so each worker limits on its
+own; set RATE_LIMIT_URL to a redis:// URL to share them between workers
+(needs `pip install redis`).
+"""
+import math
+import os
+import threading
+import time
+
+from fastapi import Depends, HTTPException, status
+
+import auth
+import models
+
+RATE_LIMIT             = os.getenv("RATE_LIMIT", "1") != "0"
+RATE_LIMIT_RATE        = float(os.getenv("RATE_LIMIT_RATE", "2"))       # tokens per second
+RATE_LIMIT_BURST       = float(os.getenv("RATE_LIMIT_BURST", "60"))     # bucket size
+RATE_LIMIT_CONCURRENCY = int(os.getenv("RATE_LIMIT_CONCURRENCY", "2"))  # per user, concurrent=True routes
+RATE_LIMIT_URL         = os.getenv("RATE_LIMIT_URL")                    # redis://… to share between workers
+
+
+class RateLimiter:
+    """In-process token buckets and in-flight counters keyed by user id."""
+
+    def __init__(self, rate: float = RATE_LIMIT_RATE, burst: float = RATE_LIMIT_BURST,
+                 concurrency: int = RATE_LIMIT_CONCURRENCY):
+        self.rate        = rate
+        self.burst       = burst
+        self.concurrency = concurrency
+        self.allowed     = 0
+        self.limited     = 0
+        self.rejected    = 0   # over the concurrency cap
+        self._buckets: dict[int, tuple[float, float]] = {}   # user_id → (tokens, updated)
+        self._in_flight: dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    async def take(self, user_id: int, cost: float) -> float:
+        """Spend `cost` tokens; return 0 if allowed, else seconds until it would be."""
+        now = time.monotonic()
+        with self._lock:
+            if len(self._buckets) > 10000:
+                self._prune(now)
+            tokens, updated = self._buckets.get(user_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                self._buckets[user_id] = (tokens - cost, now)
+                self.allowed += 1
+                return 0.0
+            self._buckets[user_id] = (tokens, now)
+            self.limited += 1
+            return (cost - tokens) / self.rate
+
+    def _prune(self, now: float) -> None:
+        # A bucket that has refilled completely is the same as no bucket
+        full = self.burst / self.rate
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < full}
+
+    async def acquire(self, user_id: int) -> bool:
+        with self._lock:
+            n = self._in_flight.get(user_id, 0)
+            if n >= self.concurrency:
+                self.rejected += 1
+                return False
+            self._in_flight[user_id] = n + 1
+            return True
+
+    async def release(self, user_id: int) -> None:
+        with self._lock:
+            n = self._in_flight.pop(user_id, 1) - 1
+            if n > 0:
+                self._in_flight[user_id] = n
+
+    def stats(self) -> dict:
+        return {
+            "backend":   "memory",
+            "allowed":   self.allowed,
+            "limited":   self.limited,
+            "rejected":  self.rejected,
+            "in_flight": sum(self._in_flight.values()),
+        }
+
+
+# Refill and spend atomically, on Redis' clock so workers agree on the time
+_TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1e6
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or burst
+local updated = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisRateLimiter(RateLimiter):
+    """Same interface, backed by Redis (asyncio client) so the limits hold across workers."""
+
+    # In-flight counters outlive a crashed worker by at most this long
+    SLOT_TTL = 3600
+
+    def __init__(self, url: str, **kwargs):
+        super().__init__(**kwargs)
+        try:
+            import redis.asyncio
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_URL is set but the `redis` package is not installed")
+        self._redis = redis.asyncio.Redis.from_url(url)
+        self._take  = self._redis.register_script(_TAKE_SCRIPT)
+
+    async def take(self, user_id: int, cost: float) -> float:
+        wait = float(await self._take(keys=[f"fintrack:bucket:{user_id}"], args=[self.rate, self.burst, cost]))
+        if wait:
+            self.limited += 1
+        else:
+            self.allowed += 1
+        return wait
+
+    async def acquire(self, user_id: int) -> bool:
+        key = f"fintrack:inflight:{user_id}"
+        n, _ = await self._redis.pipeline().incr(key).expire(key, self.SLOT_TTL).execute()
+        if n > self.concurrency:
+            await self._redis.decr(key)
+            self.rejected += 1
+            return False
+        return True
+
+    async def release(self, user_id: int) -> None:
+        await self._redis.decr(f"fintrack:inflight:{user_id}")
+
+    def stats(self) -> dict:
+        return {**super().stats(), "backend": "redis", "in_flight": None}
+
+
+limiter = RedisRateLimiter(RATE_LIMIT_URL) if RATE_LIMIT_URL else RateLimiter()
+
+
+def _too_many(detail: str, retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def limit(cost: float = 1, concurrent: bool = False):
+    """
+    Route dependency spending `cost` tokens from the user's bucket. With
+    concurrent=True the request also holds one of the user's in-flight slots
+    until the response (including a streamed body) has been sent; that relies
+    on FastAPI >= 0.118 running yield-dependency teardown after the response.
+    """
+    cost = min(cost, RATE_LIMIT_BURST)   # a cost over the burst could never be paid
+
+    async def dependency(current_user: models.User = Depends(auth.get_current_user)):
+        if not RATE_LIMIT:
+            yield
+            return
+        if concurrent and not await limiter.acquire(current_user.id):
+            raise _too_many("Too many requests in progress", 1)
+        try:
+            wait = await limiter.take(current_user.id, cost)
+            if wait:
+                raise _too_many("Rate limit exceeded", wait)
+            yield
+        finally:
+            if concurrent:
+                await limiter.release(current_user.id)
+
+    return dependency
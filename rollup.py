@@ -0,0 +1,177 @@
+"""
+Incremental maintenance of the daily_spend rollup (models.DailySpend).
+
+ORM writes to expenses — the API routers and the chat tools — are picked up
+by mapper events, summed per flush and applied with one upsert in the same
+transaction (so a batch of N expenses doesn't cost N upserts). Bulk Core statements
+bypass those events, so the importer and the category router call
+apply_rows() / uncategorize() themselves.
+
+Backfill or repair from raw expenses:
+
+    python rollup.py            # all users
+    python rollup.py --user 42
+"""
+import argparse
+import logging
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from sqlalchemy import bindparam, delete, event, func, inspect, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, object_session
+
+from database import Base, engine
+import models
+
+logger = logging.getLogger("fintrack.rollup")
+
+Key = tuple  # (user_id, day, category_id)
+
+NO_CATEGORY = 0
+
+
+def _key(user_id: int, day, category_id: Optional[int]) -> Key:
+    return (user_id, day, category_id or NO_CATEGORY)
+
+
+def _upsert(conn: Connection, source=None):
+    """
+    INSERT … ON CONFLICT that adds to an existing row instead of failing.
+    Takes executemany parameters, or rows from a `source` SELECT.
+    """
+    dialect = {"sqlite": sqlite, "postgresql": postgresql}.get(conn.dialect.name)
+    if dialect is None:
+        raise NotImplementedError(f"daily_spend upsert is not implemented for {conn.dialect.name}")
+    t = models.DailySpend.__table__
+    stmt = dialect.insert(t)
+    if source is not None:
+        stmt = stmt.from_select(["user_id", "day", "category_id", "total", "count"], source)
+    return stmt.on_conflict_do_update(
+        index_elements=[t.c.user_id, t.c.day, t.c.category_id],
+        set_={
+            "total": t.c.total + stmt.excluded.total,
+            "count": t.c.count + stmt.excluded.count,
+        },
+    )
+
+
+def apply(conn: Connection, deltas: dict[Key, list]) -> None:
+    """Add {key: [amount, count]} deltas; rows whose count drops to 0 are removed."""
+    rows = [
+        {"user_id": u, "day": d, "category_id": c, "total": amount, "count": n}
+        for (u, d, c), (amount, n) in deltas.items()
+        if n or amount
+    ]
+    if not rows:
+        return
+    conn.execute(_upsert(conn), rows)
+    # Only keys that were decremented can have dropped to 0
+    emptied = [
+        {"u": r["user_id"], "d": r["day"], "c": r["category_id"]}
+        for r in rows if r["count"] < 0
+    ]
+    if emptied:
+        t = models.DailySpend.__table__
+        conn.execute(
+            delete(t).where(
+                t.c.user_id == bindparam("u"), t.c.day == bindparam("d"),
+                t.c.category_id == bindparam("c"), t.c.count <= 0,
+            ),
+            emptied,
+        )
+
+
+def _fold(deltas: dict[Key, list], rows: Iterable[dict], sign: int = 1) -> None:
+    for r in rows:
+        d = deltas[_key(r["user_id"], r["date"], r.get("category_id"))]
+        d[0] += sign * r["amount"]
+        d[1] += sign
+
+
+def apply_rows(conn: Connection, rows: Iterable[dict], sign: int = 1) -> None:
+    """Fold expense dicts (user_id, date, category_id, amount) into the rollup."""
+    deltas: dict[Key, list] = defaultdict(lambda: [0.0, 0])
+    _fold(deltas, rows, sign)
+    apply(conn, deltas)
+
+
+def uncategorize(conn: Connection, user_id: int, category_id: int) -> None:
+    """Move a category's rollup rows to NO_CATEGORY (its expenses were unlinked)."""
+    t = models.DailySpend.__table__
+    moved = (
+        select(t.c.user_id, t.c.day, literal(NO_CATEGORY), t.c.total, t.c.count)
+        .where(t.c.user_id == user_id, t.c.category_id == category_id)
+    )
+    conn.execute(_upsert(conn, moved))
+    conn.execute(delete(t).where(t.c.user_id == user_id, t.c.category_id == category_id))
+
+
+def rebuild(conn: Connection, user_id: Optional[int] = None) -> None:
+    """Recompute the rollup from raw expenses (one user or everyone)."""
+    e = models.Expense
+    t = models.DailySpend.__table__
+    source = select(
+        e.user_id, e.date, func.coalesce(e.category_id, NO_CATEGORY),
+        func.sum(e.amount), func.count(e.id),
+    ).group_by(e.user_id, e.date, func.coalesce(e.category_id, NO_CATEGORY))
+    wipe = delete(t)
+    if user_id is not None:
+        source = source.where(e.user_id == user_id)
+        wipe = wipe.where(t.c.user_id == user_id)
+    conn.execute(wipe)
+    conn.execute(t.insert().from_select(["user_id", "day", "category_id", "total", "count"], source))
+
+
+# ─────────────────────────── ORM EVENTS ───────────────────────────
+
+def _row(target: models.Expense, old: bool = False) -> dict:
+    state = inspect(target)
+    values = {}
+    for attr in ("user_id", "date", "category_id", "amount"):
+        hist = state.attrs[attr].history
+        values[attr] = hist.deleted[0] if old and hist.deleted else getattr(target, attr)
+    return values
+
+
+def _pending(target: models.Expense) -> dict[Key, list]:
+    """Deltas collected during the current flush of target's session."""
+    return object_session(target).info.setdefault("rollup_deltas", defaultdict(lambda: [0.0, 0]))
+
+
+@event.listens_for(models.Expense, "after_insert")
+def _expense_inserted(mapper, connection, target) -> None:
+    _fold(_pending(target), [_row(target)])
+
+
+@event.listens_for(models.Expense, "after_delete")
+def _expense_deleted(mapper, connection, target) -> None:
+    _fold(_pending(target), [_row(target, old=True)], sign=-1)
+
+
+@event.listens_for(models.Expense, "after_update")
+def _expense_updated(mapper, connection, target) -> None:
+    state = inspect(target)
+    if not any(state.attrs[a].history.has_changes() for a in ("user_id", "date", "category_id", "amount")):
+        return
+    _fold(_pending(target), [_row(target, old=True)], sign=-1)
+    _fold(_pending(target), [_row(target)])
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_pending(session: Session, flush_context) -> None:
+    deltas = session.info.pop("rollup_deltas", None)
+    if deltas:
+        apply(session.connection(), deltas)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild the daily_spend rollup from expenses")
+    parser.add_argument("--user", type=int, help="only this user id")
+    args = parser.parse_args()
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        rebuild(conn, args.user)
+    logger.info("daily_spend rebuilt%s", f" for user {args.user}" if args.user else "")
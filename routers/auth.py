@@ -1,29 +1,30 @@
 from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from database import get_db
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
 import models, schemas, auth as auth_utils
 
 router = APIRouter(prefix="/api/auth", tags=["Auth"])
 
 
 @router.post("/register", response_model=schemas.Token, status_code=status.HTTP_201_CREATED)
-def register(data: schemas.UserRegister, db: Session = Depends(get_db)):
+async def register(data: schemas.UserRegister, db: AsyncSession = Depends(get_async_db)):
     """Register a new user. Returns JWT token."""
-    if db.query(models.User).filter(models.User.email == data.email).first():
+    if await db.scalar(select(models.User.id).where(models.User.email == data.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
 
     user = models.User(
         email=data.email,
         username=data.username,
-        password_hash=auth_utils.hash_password(data.password),
+        password_hash=await auth_utils.hash_password_async(data.password),
     )
     db.add(user)
-    db.flush()
+    await db.flush()
 
     # Create default settings for the new user
     db.add(models.UserSettings(user_id=user.id))
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     return schemas.Token(
         access_token=auth_utils.create_access_token(user.id),
@@ -32,12 +33,17 @@ def register(data: schemas.UserRegister, db: Session = Depends(get_db)):
 
 
 @router.post("/login", response_model=schemas.Token)
-def login(data: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(data: schemas.UserLogin, db: AsyncSession = Depends(get_async_db)):
     """Login with email + password. Returns JWT token."""
-    user = db.query(models.User).filter(models.User.email == data.email).first()
-    if not user or not auth_utils.verify_password(data.password, user.password_hash):
+    user = await db.scalar(select(models.User).where(models.User.email == data.email))
+    if not user or not await auth_utils.verify_password_async(data.password, user.password_hash):
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
+    # BCRYPT_ROUNDS changed since this hash was made — upgrade it transparently
+    if auth_utils.needs_rehash(user.password_hash):
+        user.password_hash = await auth_utils.hash_password_async(data.password)
+        await db.commit()
+
     return schemas.Token(
         access_token=auth_utils.create_access_token(user.id),
         user=schemas.UserOut.model_validate(user),
@@ -45,6 +51,6 @@ def login(data: schemas.UserLogin, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=schemas.UserOut)
-def me(current_user: models.User = Depends(auth_utils.get_current_user)):
+async def me(current_user: models.User = Depends(auth_utils.get_current_user)):
     """Return the currently authenticated user."""
     return current_user
@@ -1,75 +1,113 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
-import models, schemas, auth
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import date
+from database import get_async_db
+import models, schemas, auth, analytics, rollup, versions
 
 router = APIRouter(prefix="/api/categories", tags=["Categories"])
 
 
 @router.get("", response_model=List[schemas.CategoryOut])
-def list_categories(
-    db: Session = Depends(get_db),
+async def list_categories(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
-    """List all categories for the current user."""
-    return (
-        db.query(models.Category)
-        .filter(models.Category.user_id == current_user.id)
+    """List all categories for the current user. Supports If-None-Match."""
+    not_modified = await versions.conditional(request, response, db, current_user.id)
+    if not_modified:
+        return not_modified
+    result = await db.scalars(
+        select(models.Category)
+        .where(models.Category.user_id == current_user.id)
         .order_by(models.Category.created_at)
-        .all()
     )
+    return result.all()
+
+
+@router.get("/spend", response_model=List[schemas.CategorySpendOut])
+async def category_spend(
+    date_from: Optional[date] = Query(None, description="Start date YYYY-MM-DD"),
+    date_to:   Optional[date] = Query(None, description="End date YYYY-MM-DD"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """All categories with their total spending in the period (0 if none)."""
+    return await analytics.category_spend(db, current_user.id, date_from, date_to)
 
 
 @router.post("", response_model=schemas.CategoryOut, status_code=status.HTTP_201_CREATED)
-def create_category(
+async def create_category(
     data: schemas.CategoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
     """Create a new category."""
     cat = models.Category(**data.model_dump(), user_id=current_user.id)
     db.add(cat)
-    db.commit()
-    db.refresh(cat)
+    await db.commit()
+    await db.refresh(cat)
     return cat
 
 
 @router.put("/{cat_id}", response_model=schemas.CategoryOut)
-def update_category(
+async def update_category(
     cat_id: int,
     data: schemas.CategoryUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
     """Update a category by ID."""
-    cat = db.query(models.Category).filter(
-        models.Category.id == cat_id,
-        models.Category.user_id == current_user.id,
-    ).first()
-    if not cat:
-        raise HTTPException(status_code=404, detail="Category not found")
+    cat = await _get_category(db, cat_id, current_user.id)
 
+    if data.name != cat.name:
+        # Import fingerprints include the category name; the expenses themselves
+        # are unchanged, so keep updated_at
+        await _update_expenses(db, cat.id, fingerprint=None, updated_at=models.Expense.updated_at)
     for field, value in data.model_dump().items():
         setattr(cat, field, value)
-    db.commit()
-    db.refresh(cat)
+    await db.commit()
+    await db.refresh(cat)
     return cat
 
 
 @router.delete("/{cat_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_category(
+async def delete_category(
     cat_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
     """Delete a category. Expenses in this category will have category_id set to NULL."""
-    cat = db.query(models.Category).filter(
+    cat = await _get_category(db, cat_id, current_user.id)
+
+    # One UPDATE instead of the ORM loading and nulling each expense;
+    # Core updates skip the rollup's and versions' ORM hooks, so do their part here
+    version = await db.run_sync(lambda s: versions.bump(s.connection(), current_user.id))
+    await _update_expenses(db, cat.id, category_id=None, fingerprint=None, version=version)
+    await db.run_sync(lambda s: rollup.uncategorize(s.connection(), current_user.id, cat.id))
+    await db.delete(cat)
+    await db.commit()
+
+
+# ── helpers ──
+
+async def _get_category(db: AsyncSession, cat_id: int, user_id: int) -> models.Category:
+    cat = await db.scalar(select(models.Category).where(
         models.Category.id == cat_id,
-        models.Category.user_id == current_user.id,
-    ).first()
+        models.Category.user_id == user_id,
+    ))
     if not cat:
         raise HTTPException(status_code=404, detail="Category not found")
+    return cat
+
 
-    db.delete(cat)
-    db.commit()
+async def _update_expenses(db: AsyncSession, cat_id: int, **values) -> None:
+    await db.execute(
+        update(models.Expense)
+        .where(models.Expense.category_id == cat_id)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
@@ -1,17 +1,30 @@
 import os
 import json
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from datetime import date, timedelta
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from pydantic import BaseModel
-from typing import List
-from openai import OpenAI
+from typing import List, Optional
+from openai import AsyncOpenAI, APIError, APITimeoutError
 
-from database import get_db
-import models, auth
+from database import get_async_db, AsyncSessionLocal
+import models, auth, analytics, compression, ratelimit
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
+logger = logging.getLogger("fintrack.chat")
+
+OPENAI_MODEL         = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+OPENAI_TIMEOUT       = float(os.getenv("OPENAI_TIMEOUT", "30"))      # seconds per model call
+OPENAI_MAX_RETRIES   = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "8"))   # model calls in flight per worker
+MAX_TOOL_ROUNDS      = 5
 
 
 # ─────────────────────────── SCHEMAS ───────────────────────────
@@ -23,6 +36,7 @@ class ChatMessage(BaseModel):
 class ChatRequest(BaseModel):
     messages: List[ChatMessage]
     lang: str = "en"
+    stream: bool = False   # reply as server-sent events, see _chat_events
 
 
 # ─────────────────────────── TOOLS DEFINITION ───────────────────────────
@@ -106,56 +120,48 @@ TOOLS = [
 
 # ─────────────────────────── TOOL EXECUTION ───────────────────────────
 
+async def _find_category(db: AsyncSession, user_id: int, name: str) -> Optional[models.Category]:
+    return await db.scalar(select(models.Category).where(
+        models.Category.user_id == user_id,
+        models.Category.name.ilike(f"%{name}%"),
+    ).limit(1))
+
+
 def _date_range(period: str):
     today = date.today()
     if period == "today":
-        return str(today), str(today)
+        return today, today
     if period == "yesterday":
         d = today - timedelta(days=1)
-        return str(d), str(d)
+        return d, d
     if period == "week":
-        return str(today - timedelta(days=7)), str(today)
+        return today - timedelta(days=7), today
     if period == "month":
-        return str(today.replace(day=1)), str(today)
+        return today.replace(day=1), today
     if period == "year":
-        return str(today.replace(month=1, day=1)), str(today)
-    return str(today), str(today)
+        return today.replace(month=1, day=1), today
+    return today, today
 
 
-def execute_tool(name: str, args: dict, user_id: int, db: Session, currency: str = "UAH") -> str:
+async def execute_tool(name: str, args: dict, user_id: int, db: AsyncSession, currency: str = "UAH") -> str:
 
     if name == "list_categories":
-        cats = db.query(models.Category).filter(models.Category.user_id == user_id).all()
-        today = date.today()
-        month_start = str(today.replace(day=1))
-        result = []
-        for c in cats:
-            spent = db.query(func.sum(models.Expense.amount)).filter(
-                models.Expense.user_id == user_id,
-                models.Expense.category_id == c.id,
-                models.Expense.date >= month_start,
-            ).scalar() or 0
-            result.append({
+        month_start = date.today().replace(day=1)
+        result = [
+            {
                 "name": c.name,
                 "icon": c.icon,
                 "budget": c.budget,
-                "spent_this_month": round(spent, 2),
-            })
+                "spent_this_month": round(c.spent, 2),
+            }
+            for c in await analytics.category_spend(db, user_id, date_from=month_start)
+        ]
         return json.dumps(result, ensure_ascii=False)
 
     if name == "get_spending_summary":
         period = args.get("period", "month")
         date_from, date_to = _date_range(period)
-        total = db.query(func.sum(models.Expense.amount)).filter(
-            models.Expense.user_id == user_id,
-            models.Expense.date >= date_from,
-            models.Expense.date <= date_to,
-        ).scalar() or 0
-        count = db.query(func.count(models.Expense.id)).filter(
-            models.Expense.user_id == user_id,
-            models.Expense.date >= date_from,
-            models.Expense.date <= date_to,
-        ).scalar() or 0
+        total, count = await analytics.spending_totals(db, user_id, date_from, date_to)
         return json.dumps({"period": period, "total": round(total, 2), "transactions": count, "currency": currency}, ensure_ascii=False)
 
     if name == "list_expenses":
@@ -163,24 +169,25 @@ def execute_tool(name: str, args: dict, user_id: int, db: Session, currency: str
         category_name = args.get("category_name")
         period       = args.get("period")
 
-        q = db.query(models.Expense).filter(models.Expense.user_id == user_id)
+        q = (
+            select(models.Expense)
+            .options(selectinload(models.Expense.category))
+            .where(models.Expense.user_id == user_id)
+        )
         if period:
             date_from, date_to = _date_range(period)
-            q = q.filter(models.Expense.date >= date_from, models.Expense.date <= date_to)
+            q = q.where(models.Expense.date >= date_from, models.Expense.date <= date_to)
         if category_name:
-            cat = db.query(models.Category).filter(
-                models.Category.user_id == user_id,
-                models.Category.name.ilike(f"%{category_name}%"),
-            ).first()
+            cat = await _find_category(db, user_id, category_name)
             if cat:
-                q = q.filter(models.Expense.category_id == cat.id)
-        exps = q.order_by(models.Expense.date.desc()).limit(limit).all()
+                q = q.where(models.Expense.category_id == cat.id)
+        exps = (await db.scalars(q.order_by(models.Expense.date.desc()).limit(limit))).all()
 
         result = []
         for e in exps:
             cat_name = e.category.name if e.category else None
             result.append({
-                "id": e.id, "date": e.date, "amount": e.amount,
+                "id": e.id, "date": str(e.date), "amount": e.amount,
                 "description": e.description, "category": cat_name,
                 "currency": currency,
             })
@@ -189,29 +196,24 @@ def execute_tool(name: str, args: dict, user_id: int, db: Session, currency: str
     if name == "add_expense":
         amount      = float(args["amount"])
         description = args["description"]
-        exp_date    = args.get("date", str(date.today()))
+        try:
+            exp_date = date.fromisoformat(args["date"]) if args.get("date") else date.today()
+        except ValueError:   # model-written text, e.g. "yesterday"; let it retry
+            return json.dumps({"error": "invalid date"})
         category_name = args.get("category_name")
 
-        category_id = None
-        if category_name:
-            cat = db.query(models.Category).filter(
-                models.Category.user_id == user_id,
-                models.Category.name.ilike(f"%{category_name}%"),
-            ).first()
-            if cat:
-                category_id = cat.id
+        cat = await _find_category(db, user_id, category_name) if category_name else None
 
         exp = models.Expense(
             user_id=user_id, amount=amount, description=description,
-            date=exp_date, currency=currency, category_id=category_id,
+            date=exp_date, currency=currency, category_id=cat.id if cat else None,
         )
         db.add(exp)
-        db.commit()
-        db.refresh(exp)
-        cat_name = exp.category.name if exp.category else None
+        await db.commit()
+        cat_name = cat.name if cat else None
         return json.dumps({
             "success": True, "id": exp.id, "amount": amount,
-            "description": description, "date": exp_date, "category": cat_name,
+            "description": description, "date": str(exp_date), "category": cat_name,
         }, ensure_ascii=False)
 
     if name == "get_top_categories":
@@ -219,25 +221,81 @@ def execute_tool(name: str, args: dict, user_id: int, db: Session, currency: str
         limit  = min(int(args.get("limit", 3)), 10)
         date_from, date_to = _date_range(period)
 
-        rows = (
-            db.query(models.Category.name, func.sum(models.Expense.amount).label("total"))
-            .join(models.Expense, models.Expense.category_id == models.Category.id)
-            .filter(
-                models.Expense.user_id == user_id,
-                models.Expense.date >= date_from,
-                models.Expense.date <= date_to,
-            )
-            .group_by(models.Category.id)
-            .order_by(func.sum(models.Expense.amount).desc())
-            .limit(limit)
-            .all()
-        )
+        rows = await analytics.top_categories(db, user_id, date_from, date_to, limit)
         result = [{"category": r.name, "total": round(r.total, 2)} for r in rows]
         return json.dumps(result, ensure_ascii=False)
 
     return json.dumps({"error": f"Unknown tool: {name}"})
 
 
+# ─────────────────────────── TOOL SCHEDULER ───────────────────────────
+#
+# Tools that only read can run side by side, each on its own pooled session
+# (an AsyncSession must not be shared between concurrent tasks). Anything else
+# is a write: it runs alone on the request session, in the order the model
+# asked for it, so reads issued after it in the same round see its effect.
+
+READ_ONLY_TOOLS = {"get_spending_summary", "list_expenses", "list_categories", "get_top_categories"}
+
+
+async def _timed_tool(name: str, args: dict, user_id: int, db: AsyncSession, currency: str):
+    started = time.perf_counter()
+    result = await execute_tool(name, args, user_id, db, currency)
+    return result, round((time.perf_counter() - started) * 1000, 1)
+
+
+async def _isolated_tool(name: str, args: dict, user_id: int, currency: str):
+    async with AsyncSessionLocal() as db:
+        return await _timed_tool(name, args, user_id, db, currency)
+
+
+def _added(result: str) -> bool:
+    """add_expense succeeded (it returns {"error": ...} for bad input)."""
+    return json.loads(result).get("success", False)
+
+
+async def _indexed(i: int, call):
+    return i, *await call
+
+
+async def iter_tool_calls(calls: list[tuple[str, dict]], user_id: int, db: AsyncSession, currency: str):
+    """
+    Execute one round of (name, args) calls, yielding (index, result, ms) as
+    each one finishes — reads in a group in completion order. A round costs
+    roughly its slowest read plus its writes.
+    """
+    i = 0
+    while i < len(calls):
+        j = i
+        while j < len(calls) and calls[j][0] in READ_ONLY_TOOLS:
+            j += 1
+        if j - i > 1:
+            tasks = [
+                asyncio.ensure_future(_indexed(k, _isolated_tool(*calls[k], user_id, currency)))
+                for k in range(i, j)
+            ]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    yield await next_done
+            finally:   # the consumer stopped early, e.g. the client went away
+                for task in tasks:
+                    task.cancel()
+            i = j
+        else:
+            name, args = calls[i]
+            yield i, *await _timed_tool(name, args, user_id, db, currency)
+            i += 1
+
+
+async def run_tool_calls(calls: list[tuple[str, dict]], user_id: int, db: AsyncSession, currency: str):
+    """Execute one round of calls; returns (result, ms) per call, in call order."""
+    results = [None] * len(calls)
+    async for i, result, ms in iter_tool_calls(calls, user_id, db, currency):
+        logger.debug("tool %s took %.1f ms", calls[i][0], ms)
+        results[i] = (result, ms)
+    return results
+
+
 # ─────────────────────────── SYSTEM PROMPT ───────────────────────────
 
 SYSTEM_PROMPT = """You are a smart personal finance assistant built into the FinTrack expense tracking app.
@@ -261,24 +319,77 @@ Rules:
 """
 
 
+# ─────────────────────────── MODEL CLIENT ───────────────────────────
+#
+# One AsyncOpenAI client (and HTTP connection pool) per worker, created on
+# first use. OPENAI_BASE_URL points it at a local stub, see bench/openai_stub.py.
+
+_client: Optional[AsyncOpenAI] = None
+_model_slots = asyncio.Semaphore(CHAT_MAX_CONCURRENCY)
+
+
+def get_client() -> AsyncOpenAI:
+    global _client
+    if _client is None:
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise HTTPException(status_code=503, detail="AI chat is not configured")
+        _client = AsyncOpenAI(api_key=api_key, timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+    return _client
+
+
+async def close_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+@asynccontextmanager
+async def _model_slot():
+    """Hold one of CHAT_MAX_CONCURRENCY slots, waiting at most OPENAI_TIMEOUT."""
+    try:
+        await asyncio.wait_for(_model_slots.acquire(), OPENAI_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="AI chat is busy, try again shortly",
+                            headers={"Retry-After": "5"})
+    try:
+        yield
+    finally:
+        _model_slots.release()
+
+
+async def _complete(client: AsyncOpenAI, messages: list, **kwargs):
+    """One model round. Call inside _model_slot()."""
+    try:
+        return await client.chat.completions.create(
+            model=OPENAI_MODEL,
+            messages=messages,
+            tools=TOOLS,
+            tool_choice="auto",
+            **kwargs,
+        )
+    except APITimeoutError:
+        raise HTTPException(status_code=504, detail="AI model timed out")
+    except APIError:
+        raise HTTPException(status_code=502, detail="AI model request failed")
+
+
 # ─────────────────────────── ENDPOINT ───────────────────────────
 
-@router.post("")
+@router.post("", dependencies=[Depends(ratelimit.limit(cost=10, concurrent=True))])
+@compression.no_compression   # short replies; SSE must reach the client unbuffered
 async def chat(
     req: ChatRequest,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        raise HTTPException(status_code=503, detail="AI chat is not configured")
-
-    client = OpenAI(api_key=api_key)
+    client = get_client()
 
     # Fetch user's currency setting
-    settings = db.query(models.UserSettings).filter(
+    settings = await db.scalar(select(models.UserSettings).where(
         models.UserSettings.user_id == current_user.id
-    ).first()
+    ))
     user_currency = settings.currency if settings else "UAH"
 
     system_msg = (
@@ -289,36 +400,113 @@ async def chat(
     messages = [{"role": "system", "content": system_msg}]
     messages += [{"role": m.role, "content": m.content} for m in req.messages]
 
-    # Agentic loop — allow up to 5 tool call rounds
-    for _ in range(5):
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=messages,
-            tools=TOOLS,
-            tool_choice="auto",
+    if req.stream:
+        return StreamingResponse(
+            _chat_events(client, messages, current_user.id, user_currency),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
         )
+
+    timings = []   # {"name", "ms"} per executed tool, across rounds
+    actions = []   # for the frontend (to trigger UI refresh), across rounds
+
+    # Agentic loop — allow up to MAX_TOOL_ROUNDS tool call rounds
+    for _ in range(MAX_TOOL_ROUNDS):
+        async with _model_slot():
+            response = await _complete(client, messages)
         msg = response.choices[0].message
 
         # No tool calls — return final answer
         if not msg.tool_calls:
-            return {"reply": msg.content, "action": None}
+            return {"reply": msg.content, "action": actions[-1] if actions else None, "tools": timings}
 
         # Execute tool calls
         messages.append(msg)  # assistant message with tool_calls
-        actions = []
 
-        for tc in msg.tool_calls:
-            args   = json.loads(tc.function.arguments)
-            result = execute_tool(tc.function.name, args, current_user.id, db, user_currency)
+        calls   = [(tc.function.name, json.loads(tc.function.arguments)) for tc in msg.tool_calls]
+        results = await run_tool_calls(calls, current_user.id, db, user_currency)
 
+        for tc, (result, ms) in zip(msg.tool_calls, results):
             messages.append({
                 "role":         "tool",
                 "tool_call_id": tc.id,
                 "content":      result,
             })
+            timings.append({"name": tc.function.name, "ms": ms})
 
-            # Track actions for frontend (to trigger UI refresh)
-            if tc.function.name == "add_expense":
+            if tc.function.name == "add_expense" and _added(result):
                 actions.append({"type": "expense_added", "data": json.loads(result)})
 
-    return {"reply": "Sorry, I could not complete the request.", "action": None}
+    return {"reply": "Sorry, I could not complete the request.", "action": actions[-1] if actions else None, "tools": timings}
+
+
+# ─────────────────────────── STREAMING ───────────────────────────
+#
+# Events, one JSON object per `data:` line:
+#   token         {"text": "..."}                 — reply text as it is generated
+#   tool_call     {"name": "...", "args": {...}}  — a tool is about to run
+#   tool_result   {"name": "...", "ms": 12.3}     — it finished, with its run time
+#   action        {"type": "expense_added", "data": {...}}
+#   done          {"reply": "..."}                — full reply, always last on success
+#   error         {"detail": "..."}
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+async def _chat_events(client: AsyncOpenAI, messages: list, user_id: int, currency: str):
+    # Own session: the request-scoped one may be closed while we stream
+    async with AsyncSessionLocal() as db:
+        try:
+            for _ in range(MAX_TOOL_ROUNDS):
+                parts: list[str] = []
+                calls: dict[int, dict] = {}   # index → {"id", "name", "arguments"}
+
+                async with _model_slot():
+                    stream = await _complete(client, messages, stream=True)
+                    async for chunk in stream:
+                        if not chunk.choices:
+                            continue
+                        delta = chunk.choices[0].delta
+                        if delta.content:
+                            parts.append(delta.content)
+                            yield _sse("token", {"text": delta.content})
+                        for tc in delta.tool_calls or []:
+                            call = calls.setdefault(tc.index, {"id": "", "name": "", "arguments": ""})
+                            call["id"] += tc.id or ""
+                            if tc.function:
+                                call["name"]      += tc.function.name or ""
+                                call["arguments"] += tc.function.arguments or ""
+
+                if not calls:
+                    yield _sse("done", {"reply": "".join(parts)})
+                    return
+
+                messages.append({
+                    "role": "assistant",
+                    "content": "".join(parts) or None,
+                    "tool_calls": [
+                        {"id": c["id"], "type": "function",
+                         "function": {"name": c["name"], "arguments": c["arguments"]}}
+                        for c in calls.values()
+                    ],
+                })
+                round_calls = [(c["name"], json.loads(c["arguments"] or "{}")) for c in calls.values()]
+                for name, args in round_calls:
+                    yield _sse("tool_call", {"name": name, "args": args})
+                round_ids = [c["id"] for c in calls.values()]
+                results: dict[int, str] = {}
+                async for i, result, ms in iter_tool_calls(round_calls, user_id, db, currency):
+                    results[i] = result
+                    name = round_calls[i][0]
+                    yield _sse("tool_result", {"name": name, "ms": ms})
+                    if name == "add_expense" and _added(result):
+                        yield _sse("action", {"type": "expense_added", "data": json.loads(result)})
+                for i, call_id in enumerate(round_ids):
+                    messages.append({"role": "tool", "tool_call_id": call_id, "content": results[i]})
+
+            yield _sse("done", {"reply": "Sorry, I could not complete the request."})
+        except HTTPException as e:
+            yield _sse("error", {"detail": e.detail})
+        except (APIError, ValueError) as e:
+            yield _sse("error", {"detail": f"AI chat failed: {e}"})
@@ -1,103 +1,315 @@
-from fastapi import APIRouter, HTTPException, Depends, Query, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from database import get_db
-import models, schemas, auth
+import base64
+import binascii
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response, status
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from typing import List, Literal, Optional
+from datetime import date
+from database import get_async_db
+import models, schemas, auth, fastjson, ratelimit, versions, search as search_index
 
 router = APIRouter(prefix="/api/expenses", tags=["Expenses"])
 
+# Just the columns schemas.ExpenseOut needs, category joined in
+LIST_COLUMNS = (
+    select(
+        models.Expense.id, models.Expense.user_id, models.Expense.category_id,
+        models.Expense.amount, models.Expense.currency, models.Expense.description,
+        models.Expense.date, models.Expense.created_at, models.Expense.updated_at,
+        models.Category.name.label("cat_name"), models.Category.icon.label("cat_icon"),
+        models.Category.color.label("cat_color"), models.Category.budget.label("cat_budget"),
+        models.Category.created_at.label("cat_created_at"),
+    )
+    .outerjoin(models.Category, models.Category.id == models.Expense.category_id)
+)
+
 
 @router.get("", response_model=List[schemas.ExpenseOut])
-def list_expenses(
-    category_id: Optional[int] = Query(None,  description="Filter by category ID"),
-    date_from:   Optional[str] = Query(None,  description="Start date YYYY-MM-DD"),
-    date_to:     Optional[str] = Query(None,  description="End date YYYY-MM-DD"),
-    search:      Optional[str] = Query(None,  description="Search in description"),
-    limit:       int           = Query(1000,  ge=1, le=5000),
-    offset:      int           = Query(0,     ge=0),
-    db: Session = Depends(get_db),
+async def list_expenses(
+    request: Request,
+    response: Response,
+    category_id: Optional[int]  = Query(None,  description="Filter by category ID"),
+    date_from:   Optional[date] = Query(None,  description="Start date YYYY-MM-DD"),
+    date_to:     Optional[date] = Query(None,  description="End date YYYY-MM-DD"),
+    search:      Optional[str]  = Query(None,  description="Full-text search in description; last word matches as a prefix"),
+    order:       Literal["date", "relevance"] = Query("date", description="relevance: best search matches first (offset paging only)"),
+    limit:       int            = Query(1000,  ge=1, le=5000),
+    offset:      int            = Query(0,     ge=0),
+    cursor:      Optional[str]  = Query(None,  description="Opaque cursor from X-Next-Cursor; replaces offset"),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
-    """List expenses with optional filters."""
-    q = db.query(models.Expense).filter(models.Expense.user_id == current_user.id)
+    """
+    List expenses with optional filters, newest first (or by search relevance).
+
+    Pass the X-Next-Cursor header of one page as `cursor` to get the next one —
+    every page costs the same index seek, unlike deep `offset` pages.
+    Supports If-None-Match: unchanged data returns 304 without querying it.
+    """
+    not_modified = await versions.conditional(request, response, db, current_user.id)
+    if not_modified:
+        return not_modified
+
+    q = LIST_COLUMNS.where(models.Expense.user_id == current_user.id)
 
     if category_id is not None:
-        q = q.filter(models.Expense.category_id == category_id)
+        q = q.where(models.Expense.category_id == category_id)
     if date_from:
-        q = q.filter(models.Expense.date >= date_from)
+        q = q.where(models.Expense.date >= date_from)
     if date_to:
-        q = q.filter(models.Expense.date <= date_to)
+        q = q.where(models.Expense.date <= date_to)
+    ranked = bool(search) and order == "relevance"
     if search:
-        q = q.filter(models.Expense.description.ilike(f"%{search}%"))
+        q = search_index.apply(q, search, current_user.id, ranked=ranked)
 
-    return q.order_by(models.Expense.date.desc(), models.Expense.id.desc()).offset(offset).limit(limit).all()
+    q = q.order_by(models.Expense.date.desc(), models.Expense.id.desc())
+    if cursor and not ranked:
+        after_date, after_id = _decode_cursor(cursor)
+        q = q.where(or_(
+            models.Expense.date < after_date,
+            and_(models.Expense.date == after_date, models.Expense.id < after_id),
+        ))
+    else:
+        q = q.offset(offset)
+
+    # Plain rows, no ORM objects or response_model validation: a 5000-row
+    # page otherwise holds several full copies of itself while encoding
+    rows = (await db.execute(q.limit(limit))).all()
+    if len(rows) == limit and not ranked:
+        response.headers["X-Next-Cursor"] = _encode_cursor(rows[-1])
+    headers = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return Response(fastjson.dumps(expense_dicts(rows)), media_type="application/json", headers=headers)
 
 
 @router.post("", response_model=schemas.ExpenseOut, status_code=status.HTTP_201_CREATED)
-def create_expense(
+async def create_expense(
     data: schemas.ExpenseCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
     """Create a new expense."""
     if data.category_id:
-        _verify_category(db, data.category_id, current_user.id)
+        await _verify_category(db, data.category_id, current_user.id)
 
     expense = models.Expense(**data.model_dump(), user_id=current_user.id)
     db.add(expense)
-    db.commit()
-    db.refresh(expense)
+    await db.commit()
+    await db.refresh(expense, ["category"])
     return expense
 
 
+# ── batch ──
+# Declared before the /{exp_id} routes so "batch" isn't parsed as an id.
+# Each batch is one transaction: valid items are written together, invalid
+# ones are reported per item with the status the single-item endpoint uses.
+
+@router.post("/batch", response_model=schemas.ExpenseBatchOut, dependencies=[Depends(ratelimit.limit(cost=5))])
+async def create_expenses_batch(
+    data: schemas.ExpenseBatchCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Create many expenses in one transaction."""
+    categories = await _owned_categories(db, current_user.id, [i.category_id for i in data.items])
+
+    results, created = [], []
+    for index, item in enumerate(data.items):
+        if item.category_id and item.category_id not in categories:
+            results.append(schemas.ExpenseBatchResult(index=index, status=404, error="Category not found"))
+            continue
+        expense = models.Expense(**item.model_dump(), user_id=current_user.id)
+        expense.category = categories.get(item.category_id)
+        db.add(expense)
+        created.append((index, expense))
+
+    await db.commit()
+    results += [_batch_ok(index, 201, expense) for index, expense in created]
+    return _batch_out(results)
+
+
+@router.patch("/batch", response_model=schemas.ExpenseBatchOut, dependencies=[Depends(ratelimit.limit(cost=5))])
+async def update_expenses_batch(
+    data: schemas.ExpenseBatchPatch,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Partially update many expenses in one transaction."""
+    expenses = await _owned_expenses(db, current_user.id, [i.id for i in data.items])
+    categories = await _owned_categories(db, current_user.id, [i.category_id for i in data.items])
+
+    results, updated = [], []
+    for index, item in enumerate(data.items):
+        expense = expenses.get(item.id)
+        fields = item.model_dump(exclude_unset=True, exclude={"id"})
+        if not expense:
+            results.append(schemas.ExpenseBatchResult(index=index, id=item.id, status=404, error="Expense not found"))
+            continue
+        nulls = [f for f, v in fields.items() if v is None and f != "category_id"]
+        if nulls:
+            results.append(schemas.ExpenseBatchResult(index=index, id=item.id, status=422, error=f"{nulls[0]} can't be null"))
+            continue
+        if fields.get("category_id") and fields["category_id"] not in categories:
+            results.append(schemas.ExpenseBatchResult(index=index, id=item.id, status=404, error="Category not found"))
+            continue
+        for field, value in fields.items():
+            setattr(expense, field, value)
+        if "category_id" in fields:
+            expense.category = categories.get(fields["category_id"])
+        expense.fingerprint = None
+        updated.append((index, expense))
+
+    await db.commit()
+    results += [_batch_ok(index, 200, expense) for index, expense in updated]
+    return _batch_out(results)
+
+
+@router.delete("/batch", response_model=schemas.ExpenseBatchOut, dependencies=[Depends(ratelimit.limit(cost=5))])
+async def delete_expenses_batch(
+    data: schemas.ExpenseBatchDelete,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Delete many expenses in one transaction."""
+    expenses = await _owned_expenses(db, current_user.id, data.ids)
+
+    results = []
+    for index, exp_id in enumerate(data.ids):
+        expense = expenses.pop(exp_id, None)   # pop: a repeated id is deleted once
+        if not expense:
+            results.append(schemas.ExpenseBatchResult(index=index, id=exp_id, status=404, error="Expense not found"))
+            continue
+        await db.delete(expense)
+        results.append(schemas.ExpenseBatchResult(index=index, id=exp_id, status=204))
+
+    await db.commit()
+    return _batch_out(results)
+
+
 @router.put("/{exp_id}", response_model=schemas.ExpenseOut)
-def update_expense(
+async def update_expense(
     exp_id: int,
     data: schemas.ExpenseUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
     """Update an expense by ID."""
-    expense = _get_expense(db, exp_id, current_user.id)
+    expense = await _get_expense(db, exp_id, current_user.id)
 
     if data.category_id:
-        _verify_category(db, data.category_id, current_user.id)
+        await _verify_category(db, data.category_id, current_user.id)
 
     for field, value in data.model_dump().items():
         setattr(expense, field, value)
-    db.commit()
-    db.refresh(expense)
+    expense.fingerprint = None   # recomputed lazily by the next dedupe import
+    await db.commit()
+    await db.refresh(expense, ["category"])
     return expense
 
 
 @router.delete("/{exp_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_expense(
+async def delete_expense(
     exp_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
     """Delete an expense by ID."""
-    expense = _get_expense(db, exp_id, current_user.id)
-    db.delete(expense)
-    db.commit()
+    expense = await _get_expense(db, exp_id, current_user.id)
+    await db.delete(expense)
+    await db.commit()
 
 
 # ── helpers ──
 
-def _get_expense(db: Session, exp_id: int, user_id: int) -> models.Expense:
-    exp = db.query(models.Expense).filter(
+async def _get_expense(db: AsyncSession, exp_id: int, user_id: int) -> models.Expense:
+    exp = await db.scalar(select(models.Expense).where(
         models.Expense.id == exp_id,
         models.Expense.user_id == user_id,
-    ).first()
+    ))
     if not exp:
         raise HTTPException(status_code=404, detail="Expense not found")
     return exp
 
 
-def _verify_category(db: Session, cat_id: int, user_id: int) -> None:
-    cat = db.query(models.Category).filter(
+async def _verify_category(db: AsyncSession, cat_id: int, user_id: int) -> None:
+    found = await db.scalar(select(models.Category.id).where(
         models.Category.id == cat_id,
         models.Category.user_id == user_id,
-    ).first()
-    if not cat:
+    ))
+    if not found:
         raise HTTPException(status_code=404, detail="Category not found")
+
+
+async def _owned_categories(db: AsyncSession, user_id: int, ids) -> dict[int, models.Category]:
+    """The user's categories among `ids`, in one query."""
+    ids = {i for i in ids if i}
+    if not ids:
+        return {}
+    cats = await db.scalars(select(models.Category).where(
+        models.Category.user_id == user_id,
+        models.Category.id.in_(ids),
+    ))
+    return {c.id: c for c in cats}
+
+
+async def _owned_expenses(db: AsyncSession, user_id: int, ids) -> dict[int, models.Expense]:
+    rows = await db.scalars(
+        select(models.Expense)
+        .options(selectinload(models.Expense.category))
+        .where(models.Expense.user_id == user_id, models.Expense.id.in_(set(ids)))
+    )
+    return {e.id: e for e in rows}
+
+
+def _batch_ok(index: int, status_code: int, expense: models.Expense) -> schemas.ExpenseBatchResult:
+    return schemas.ExpenseBatchResult(
+        index=index, id=expense.id, status=status_code,
+        expense=schemas.ExpenseOut.model_validate(expense),
+    )
+
+
+def _batch_out(results: list[schemas.ExpenseBatchResult]) -> schemas.ExpenseBatchOut:
+    results.sort(key=lambda r: r.index)
+    failed = sum(r.status >= 400 for r in results)
+    return schemas.ExpenseBatchOut(results=results, succeeded=len(results) - failed, failed=failed)
+
+
+def expense_dicts(rows) -> list[dict]:
+    """LIST_COLUMNS rows in the schemas.ExpenseOut shape."""
+    return [
+        {
+            "amount":      r.amount,
+            "currency":    r.currency,
+            "description": r.description,
+            "date":        r.date,
+            "category_id": r.category_id,
+            "id":          r.id,
+            "user_id":     r.user_id,
+            "created_at":  r.created_at,
+            "updated_at":  r.updated_at,
+            "category": None if r.cat_name is None else {
+                "name":       r.cat_name,
+                "icon":       r.cat_icon,
+                "color":      r.cat_color,
+                "budget":     r.cat_budget,
+                "id":         r.category_id,
+                "user_id":    r.user_id,
+                "created_at": r.cat_created_at,
+            },
+        }
+        for r in rows
+    ]
+
+
+def _encode_cursor(exp: models.Expense) -> str:
+    raw = f"{exp.date.isoformat()}:{exp.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        day, exp_id = raw.split(":")
+        return date.fromisoformat(day), int(exp_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
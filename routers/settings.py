@@ -1,42 +1,48 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database import get_db
-import models, schemas, auth
+from fastapi import APIRouter, Depends, Request, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+import models, schemas, auth, versions
 
 router = APIRouter(prefix="/api/settings", tags=["Settings"])
 
 
-def _get_or_create_settings(db: Session, user_id: int) -> models.UserSettings:
-    settings = db.query(models.UserSettings).filter(
+async def _get_or_create_settings(db: AsyncSession, user_id: int) -> models.UserSettings:
+    settings = await db.scalar(select(models.UserSettings).where(
         models.UserSettings.user_id == user_id
-    ).first()
+    ))
     if not settings:
         settings = models.UserSettings(user_id=user_id)
         db.add(settings)
-        db.commit()
-        db.refresh(settings)
+        await db.commit()
+        await db.refresh(settings)
     return settings
 
 
 @router.get("", response_model=schemas.SettingsOut)
-def get_settings(
-    db: Session = Depends(get_db),
+async def get_settings(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
-    """Get settings for the current user."""
-    return _get_or_create_settings(db, current_user.id)
+    """Get settings for the current user. Supports If-None-Match."""
+    not_modified = await versions.conditional(request, response, db, current_user.id)
+    if not_modified:
+        return not_modified
+    return await _get_or_create_settings(db, current_user.id)
 
 
 @router.put("", response_model=schemas.SettingsOut)
-def update_settings(
+async def update_settings(
     data: schemas.SettingsUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: models.User = Depends(auth.get_current_user),
 ):
     """Update settings. Only provided fields are changed."""
-    settings = _get_or_create_settings(db, current_user.id)
+    settings = await _get_or_create_settings(db, current_user.id)
     for field, value in data.model_dump(exclude_none=True).items():
         setattr(settings, field, value)
-    db.commit()
-    db.refresh(settings)
+    await db.commit()
+    await db.refresh(settings)
     return settings
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from datetime import date, timedelta
+from database import get_async_db
+import models, schemas, auth, analytics
+
+router = APIRouter(prefix="/api/stats", tags=["Stats"])
+
+
+def _month_bounds(month: Optional[str]) -> tuple[date, date]:
+    """First and last day of a YYYY-MM month (default: the current one)."""
+    try:
+        start = date.fromisoformat(f"{month}-01") if month else date.today().replace(day=1)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid month")
+    next_month = (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start, next_month - timedelta(days=1)
+
+
+def _range(date_from: Optional[date], date_to: Optional[date]) -> tuple[date, date]:
+    """Missing ends default to the current month."""
+    month_start, month_end = _month_bounds(None)
+    return date_from or month_start, date_to or month_end
+
+
+@router.get("/summary", response_model=schemas.SummaryOut)
+async def summary(
+    date_from: Optional[date] = Query(None, description="Start date YYYY-MM-DD (default: start of month)"),
+    date_to:   Optional[date] = Query(None, description="End date YYYY-MM-DD (default: end of month)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Total spending and number of expenses in the period."""
+    date_from, date_to = _range(date_from, date_to)
+    total, count = await analytics.spending_totals(db, current_user.id, date_from, date_to)
+    return {"date_from": date_from, "date_to": date_to, "total": total, "count": count}
+
+
+@router.get("/totals", response_model=List[schemas.PeriodTotalOut])
+async def totals(
+    period:    str            = Query("month", pattern="^(month|year)$", description="month | year"),
+    date_from: Optional[date] = Query(None, description="Start date YYYY-MM-DD"),
+    date_to:   Optional[date] = Query(None, description="End date YYYY-MM-DD"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Spending per month or year, oldest first. All time unless limited."""
+    return await analytics.period_totals(db, current_user.id, period, date_from, date_to)
+
+
+@router.get("/categories", response_model=List[schemas.CategorySpendOut])
+async def by_category(
+    date_from: Optional[date] = Query(None, description="Start date YYYY-MM-DD (default: start of month)"),
+    date_to:   Optional[date] = Query(None, description="End date YYYY-MM-DD (default: end of month)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Every category with its spending in the period."""
+    date_from, date_to = _range(date_from, date_to)
+    return await analytics.category_spend(db, current_user.id, date_from, date_to)
+
+
+@router.get("/daily", response_model=List[schemas.DailyTotalOut])
+async def daily(
+    date_from: Optional[date] = Query(None, description="Start date YYYY-MM-DD (default: start of month)"),
+    date_to:   Optional[date] = Query(None, description="End date YYYY-MM-DD (default: end of month)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Daily totals for charting; days without spending are omitted."""
+    date_from, date_to = _range(date_from, date_to)
+    return await analytics.daily_series(db, current_user.id, date_from, date_to)
+
+
+@router.get("/budgets", response_model=List[schemas.BudgetUsageOut])
+async def budgets(
+    month: Optional[str] = Query(None, pattern=r"^\d{4}-\d{2}$", description="YYYY-MM (default: current month)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """Budget utilization for every category that has a budget."""
+    date_from, date_to = _month_bounds(month)
+    rows = await analytics.category_spend(db, current_user.id, date_from, date_to)
+    return [
+        {
+            "id": r.id, "name": r.name, "icon": r.icon, "color": r.color,
+            "budget": r.budget, "spent": r.spent,
+            "utilization": round(r.spent / r.budget, 4),
+        }
+        for r in rows
+        if r.budget
+    ]
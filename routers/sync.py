@@ -0,0 +1,79 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from database import get_async_db
+import models, schemas, auth, versions
+
+router = APIRouter(prefix="/api/sync", tags=["Sync"])
+
+
+@router.get("", response_model=schemas.SyncOut)
+async def sync(
+    since: Optional[str] = Query(None, description="`since` from the previous response; omit for a full sync"),
+    limit: int = Query(1000, ge=1, le=5000),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(auth.get_current_user),
+):
+    """
+    Expenses inserted, updated or deleted after `since`.
+
+    Every write stamps the user's next data version on the rows it touches,
+    so the delta is an index range scan over (user_id, version, id). Keep
+    calling with the returned `since` while `has_more` is true.
+    """
+    after_version, after_id = _decode_since(since)
+    # Upper bound first: writes committing while we read are left for the next call
+    upto = await versions.current(db, current_user.id)
+
+    e = models.Expense
+    changed = (await db.scalars(
+        select(e)
+        .options(selectinload(e.category))
+        .where(
+            e.user_id == current_user.id,
+            e.version <= upto,
+            e.version > after_version if after_id is None else
+            or_(e.version > after_version, and_(e.version == after_version, e.id > after_id)),
+        )
+        .order_by(e.version, e.id)
+        .limit(limit + 1)
+    )).all()
+
+    has_more = len(changed) > limit
+    if has_more:
+        changed = changed[:limit]
+        upto = changed[-1].version
+        next_since = f"{upto}:{changed[-1].id}"
+    else:
+        next_since = str(upto)
+
+    # Deletes in (after_version, upto]: each page reports its own slice exactly once
+    t = models.ExpenseTombstone
+    deleted = (await db.scalars(
+        select(t.expense_id).where(
+            t.user_id == current_user.id,
+            t.version > after_version,
+            t.version <= upto,
+        ).order_by(t.version)
+    )).all() if upto > after_version else []
+
+    return {"since": next_since, "has_more": has_more, "changed": changed, "deleted": deleted}
+
+
+# ── helpers ──
+
+def _decode_since(since: Optional[str]) -> tuple[int, Optional[int]]:
+    """
+    "<version>" — everything up to that version was received.
+    "<version>:<id>" — a paged sync stopped part-way through that version.
+    Rows from before change tracking have version 0, so a full sync starts at -1.
+    """
+    if since is None:
+        return -1, None
+    try:
+        version, _, exp_id = since.partition(":")
+        return int(version), int(exp_id) if exp_id else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid since")
@@ -1,7 +1,7 @@
 from __future__ import annotations
-from datetime import datetime
+from datetime import datetime, date as date_type
 from typing import Optional, List
-from pydantic import BaseModel, EmailStr, ConfigDict
+from pydantic import BaseModel, EmailStr, ConfigDict, Field
 
 
 # ─────────────────────────── AUTH ───────────────────────────
@@ -57,13 +57,20 @@ class CategoryOut(CategoryBase):
     created_at: datetime
 
 
+class CategorySpendOut(CategoryBase):
+    model_config = ConfigDict(from_attributes=True)
+
+    id:    int
+    spent: float
+
+
 # ─────────────────────────── EXPENSES ───────────────────────────
 
 class ExpenseBase(BaseModel):
     amount:      float
     currency:    str           = "RUB"
     description: str
-    date:        str           # YYYY-MM-DD
+    date:        date_type     # YYYY-MM-DD
     category_id: Optional[int] = None
 
 
@@ -81,9 +88,59 @@ class ExpenseOut(ExpenseBase):
     id:         int
     user_id:    int
     created_at: datetime
+    updated_at: Optional[datetime]    = None
     category:   Optional[CategoryOut] = None
 
 
+# Upper bound on items per /api/expenses/batch request
+MAX_BATCH_SIZE = 500
+
+
+class ExpensePatch(BaseModel):
+    """Partial update: only the fields that are sent are changed."""
+    id:          int
+    amount:      Optional[float]     = None
+    currency:    Optional[str]       = None
+    description: Optional[str]       = None
+    date:        Optional[date_type] = None
+    category_id: Optional[int]       = None
+
+
+class ExpenseBatchCreate(BaseModel):
+    items: List[ExpenseCreate] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ExpenseBatchPatch(BaseModel):
+    items: List[ExpensePatch] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ExpenseBatchDelete(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class ExpenseBatchResult(BaseModel):
+    index:   int                        # position in the request
+    status:  int                        # what the single-item endpoint would return
+    id:      Optional[int]        = None
+    error:   Optional[str]        = None
+    expense: Optional[ExpenseOut] = None
+
+
+class ExpenseBatchOut(BaseModel):
+    results:   List[ExpenseBatchResult]
+    succeeded: int
+    failed:    int
+
+
+# ─────────────────────────── SYNC ───────────────────────────
+
+class SyncOut(BaseModel):
+    since:    str               # pass back as ?since= on the next call
+    has_more: bool              # call again right away with the new `since`
+    changed:  List[ExpenseOut]  # inserted or updated since the last call
+    deleted:  List[int]         # expense ids; apply before `changed`
+
+
 # ─────────────────────────── SETTINGS ───────────────────────────
 
 class SettingsUpdate(BaseModel):
@@ -100,6 +157,41 @@ class SettingsOut(BaseModel):
     theme:    str
 
 
+# ─────────────────────────── STATS ───────────────────────────
+
+class SummaryOut(BaseModel):
+    date_from: date_type
+    date_to:   date_type
+    total:     float
+    count:     int
+
+
+class PeriodTotalOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    period: str           # YYYY-MM or YYYY
+    total:  float
+    count:  int
+
+
+class DailyTotalOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    day:   date_type
+    total: float
+    count: int
+
+
+class BudgetUsageOut(BaseModel):
+    id:          int
+    name:        str
+    icon:        str
+    color:       str
+    budget:      float
+    spent:       float
+    utilization: float    # spent / budget, 1.0 = fully used
+
+
 # ─────────────────────────── EXPORT / IMPORT ───────────────────────────
 
 class ExportData(BaseModel):
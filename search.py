@@ -0,0 +1,155 @@
+"""
+Full-text search over expense descriptions.
+
+`description ILIKE '%word%'` can't use an index, so every search scanned all
+of the user's rows. Instead:
+
+    SQLite    — an FTS5 external-content table (expenses_fts) kept in sync with
+                expenses by triggers; ranked with bm25. It also indexes
+                user_id, so a MATCH only walks the searching user's rows.
+    Postgres  — a GIN index on to_tsvector('simple', description); ranked with
+                ts_rank.
+
+Queries are split into words; every word must match, as a prefix ("coff sta"
+finds "Coffee at Starbucks"). On SQLite a prefix is only cheap when its
+length has a prefix index — otherwise FTS5 merges that prefix's postings for
+every user before it can apply the user filter — so words longer than
+MAX_PREFIX match on their first MAX_PREFIX characters, and one-character
+words match exactly. migrations.py creates the index; detect() picks the backend at startup and falls back to
+ILIKE when neither is available (e.g. SQLite built without FTS5).
+"""
+import logging
+import re
+from typing import Optional
+
+from sqlalchemy import Select, column, func, inspect, literal_column, select, table, text
+from sqlalchemy.engine import Connection, Engine
+
+import models
+
+logger = logging.getLogger("fintrack.search")
+
+FTS_TABLE  = "expenses_fts"
+MAX_PREFIX = 8   # longest prefix index on expenses_fts
+PG_INDEX   = "ix_expenses_description_fts"
+
+# Must match the index expression exactly, so it's inlined rather than bound
+_PG_CONFIG = literal_column("'simple'::regconfig")
+
+backend: Optional[str] = None   # "fts5" | "tsvector" | None (ILIKE)
+
+
+# ─────────────────────────── SCHEMA ───────────────────────────
+
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        description, user_id, content='expenses', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3 4 5 6 7 8'
+    )""",
+    # Rank on description only; user_id is there to filter by
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25(1.0, 0.0)')",
+    f"""CREATE TRIGGER IF NOT EXISTS expenses_fts_ai AFTER INSERT ON expenses BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, description, user_id) VALUES (new.id, new.description, new.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expenses_fts_ad AFTER DELETE ON expenses BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, user_id)
+            VALUES ('delete', old.id, old.description, old.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS expenses_fts_au AFTER UPDATE OF description, user_id ON expenses BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, description, user_id)
+            VALUES ('delete', old.id, old.description, old.user_id);
+        INSERT INTO {FTS_TABLE}(rowid, description, user_id) VALUES (new.id, new.description, new.user_id);
+    END""",
+]
+
+FTS_TRIGGERS = ("expenses_fts_ai", "expenses_fts_ad", "expenses_fts_au")
+
+PG_DDL = f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON expenses USING gin (to_tsvector('simple'::regconfig, description))"
+
+
+def _normalize_sql(sql: str) -> str:
+    return re.sub(r"\s+", " ", sql.replace("IF NOT EXISTS ", "")).strip()
+
+
+def create_index(conn: Connection) -> None:
+    """Create the search index for this dialect; populate it if it's new."""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(PG_DDL))
+        return
+    if conn.dialect.name != "sqlite":
+        return
+    if inspect(conn).has_table(FTS_TABLE):
+        ddl = conn.scalar(text("SELECT sql FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE})
+        if _normalize_sql(ddl) == _normalize_sql(SQLITE_DDL[0]):
+            return
+        # Built with an older layout (no user_id, fewer prefix indexes): rebuild
+        logger.info("Recreating %s", FTS_TABLE)
+        for trigger in FTS_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+    try:
+        for ddl in SQLITE_DDL:
+            conn.execute(text(ddl))
+    except Exception as e:   # sqlite3 built without FTS5
+        logger.warning("FTS5 unavailable, search falls back to ILIKE: %s", e)
+        return
+    logger.info("Building %s", FTS_TABLE)
+    conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+
+def detect(engine: Engine) -> Optional[str]:
+    """Set and return the active backend based on what the database has."""
+    global backend
+    insp = inspect(engine)
+    if engine.dialect.name == "sqlite" and insp.has_table(FTS_TABLE):
+        backend = "fts5"
+    elif engine.dialect.name == "postgresql" and PG_INDEX in {ix["name"] for ix in insp.get_indexes("expenses")}:
+        backend = "tsvector"
+    else:
+        backend = None
+    return backend
+
+
+# ─────────────────────────── QUERIES ───────────────────────────
+
+def _words(query: str) -> list[str]:
+    return re.findall(r"\w+", query.casefold())
+
+
+def _fts_term(word: str) -> str:
+    if len(word) == 1:
+        return f'"{word}"'
+    return f'"{word[:MAX_PREFIX]}"*'
+
+
+def apply(q: Select, query: str, user_id: int, ranked: bool = False) -> Select:
+    """
+    Filter a select of user_id's expenses to rows matching `query`. With
+    ranked=True the best matches come first (callers add their own tie-break
+    ordering after).
+    """
+    words = _words(query)
+    if not words:
+        return q
+
+    if backend == "fts5":
+        fts = table(FTS_TABLE, column("rowid"), column("rank"))
+        # Quoted words can't be read as FTS5 operators; * makes each a prefix.
+        # The user_id phrase keeps other users' matches out of the scan
+        expr = f'user_id : "{int(user_id)}" ' + " ".join(f"description : {_fts_term(w)}" for w in words)
+        matches = literal_column(FTS_TABLE).op("MATCH")(expr)
+        if ranked:
+            return q.join(fts, fts.c.rowid == models.Expense.id).where(matches).order_by(fts.c.rank)
+        # As a join, SQLite walks the user's date index and re-runs the MATCH
+        # for every row; IN evaluates it once and probes the result
+        return q.where(models.Expense.id.in_(select(fts.c.rowid).where(matches)))
+
+    if backend == "tsvector":
+        vector = func.to_tsvector(_PG_CONFIG, models.Expense.description)
+        tsquery = func.to_tsquery(_PG_CONFIG, " & ".join(f"{w}:*" for w in words))
+        q = q.where(vector.op("@@")(tsquery))
+        return q.order_by(func.ts_rank(vector, tsquery).desc()) if ranked else q
+
+    for word in words:
+        q = q.where(models.Expense.description.ilike(f"%{word}%"))
+    return q
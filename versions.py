@@ -0,0 +1,86 @@
+"""
+Per-user data version: change tracking and conditional GET.
+
+Every flush that adds, changes or deletes a user's expenses, categories or
+settings bumps user_data_versions.version in the same transaction; bulk Core
+writes (the importer, category deletes) call bump() themselves. The new
+version is also stamped on each written expense, and a deleted expense
+leaves an ExpenseTombstone carrying it. The row lock taken by the bump
+serializes a user's writers, so versions commit in order — /api/sync uses
+that to return "everything after version N".
+
+Read endpoints derive a weak ETag from (user, version, URL), so a client
+polling unchanged data gets a 304 after one primary-key lookup — no list
+query, no serialization.
+"""
+import hashlib
+from itertools import chain
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+import models
+
+TRACKED = (models.Expense, models.Category, models.UserSettings)
+
+
+def bump(conn: Connection, user_id: int) -> int:
+    """Increment the user's data version and return the new value."""
+    dialect = {"sqlite": sqlite, "postgresql": postgresql}[conn.dialect.name]
+    t = models.UserDataVersion.__table__
+    stmt = dialect.insert(t).values(user_id=user_id, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[t.c.user_id],
+        set_={"version": t.c.version + 1},
+    ).returning(t.c.version)
+    return conn.execute(stmt).scalar_one()
+
+
+@event.listens_for(Session, "before_flush")
+def _track_writes(session: Session, flush_context, instances) -> None:
+    touched = [
+        obj for obj in chain(session.new, session.dirty, session.deleted)
+        if isinstance(obj, TRACKED) and (obj not in session.dirty or session.is_modified(obj))
+    ]
+    if not touched:
+        return
+    conn = session.connection()
+    stamp = {uid: bump(conn, uid) for uid in sorted({obj.user_id for obj in touched})}
+
+    for obj in touched:
+        if not isinstance(obj, models.Expense):
+            continue
+        if obj in session.deleted:
+            session.add(models.ExpenseTombstone(
+                user_id=obj.user_id, expense_id=obj.id, version=stamp[obj.user_id],
+            ))
+        else:
+            obj.version = stamp[obj.user_id]
+
+
+async def current(db: AsyncSession, user_id: int) -> int:
+    version = await db.scalar(
+        select(models.UserDataVersion.version).where(models.UserDataVersion.user_id == user_id)
+    )
+    return version or 0
+
+
+async def conditional(request: Request, response: Response, db: AsyncSession, user_id: int) -> Optional[Response]:
+    """
+    Return a 304 response if the client's If-None-Match still matches,
+    otherwise set ETag on `response` and return None so the endpoint proceeds.
+    """
+    version = await current(db, user_id)
+    url = hashlib.blake2s(f"{request.url.path}?{request.url.query}".encode(), digest_size=6).hexdigest()
+    etag = f'W/"{user_id}.{version}.{url}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+    if etag in {t.strip() for t in request.headers.get("if-none-match", "").split(",")}:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None